@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+from app.Metrics import InstrumentedConnection
+
+
+def open_connection(path, readonly=False, config=None):
+    """
+    Ouvre une connexion SQLite réglée pour l'application.
+    En lecture seule, la base est ouverte par URI (mode=ro) : aucune écriture
+    ni verrou d'écriture possible depuis le chemin de recherche.
+    Avec METRICS, chaque requête SQL est chronométrée (voir app.Metrics).
+    """
+    config = config or {}
+    factory = InstrumentedConnection if config.get('METRICS') else sqlite3.Connection
+    if readonly:
+        db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, factory=factory)
+    else:
+        db = sqlite3.connect(path, factory=factory)
+    db.row_factory = sqlite3.Row
+
+    if config.get('SQLITE_TUNING'):
+        if not readonly:
+            # WAL : les lecteurs continuent de lire pendant une synchronisation
+            db.execute("PRAGMA journal_mode = WAL")
+        db.execute("PRAGMA synchronous = NORMAL")
+        db.execute(f"PRAGMA cache_size = -{int(config.get('SQLITE_CACHE_KIB', 0))}")
+        db.execute(f"PRAGMA mmap_size = {int(config.get('SQLITE_MMAP_SIZE', 0))}")
+        db.execute("PRAGMA temp_store = MEMORY")
+    return db
+
+
+class ConnectionPool:
+    """
+    Connexions SQLite réutilisées d'une requête à l'autre, une par thread
+    et par mode (lecture / écriture). Chaque reprise passe par un contrôle
+    de santé ; la connexion est rouverte si elle est cassée ou si le
+    fichier de base a été remplacé.
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def acquire(self, path, readonly=False, config=None):
+        conns = self._connections()
+        cle = (path, readonly)
+
+        entree = conns.get(cle)
+        if entree is not None:
+            db, inode = entree
+            if self._is_healthy(db, path, inode):
+                return db
+            self._close(db)
+            del conns[cle]
+
+        db = open_connection(path, readonly, config)
+        conns[cle] = (db, self._inode(path))
+        return db
+
+    def release(self, db):
+        """Fin de requête : la connexion reste ouverte, sans transaction pendante"""
+        if db.in_transaction:
+            db.rollback()
+
+    def close_thread(self):
+        """Ferme les connexions du thread courant (fin d'un thread de travail)"""
+        conns = self._connections()
+        for db, _ in conns.values():
+            self._close(db)
+        conns.clear()
+
+    def _connections(self):
+        if not hasattr(self._local, 'conns'):
+            self._local.conns = {}
+        return self._local.conns
+
+    def _is_healthy(self, db, path, inode):
+        if self._inode(path) != inode:
+            return False
+        try:
+            db.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _inode(self, path):
+        try:
+            return os.stat(path).st_ino
+        except OSError:
+            return None
+
+    def _close(self, db):
+        try:
+            db.close()
+        except sqlite3.Error:
+            pass
+
+
+# Instance partagée par le processus
+pool = ConnectionPool()
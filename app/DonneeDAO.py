@@ -1,17 +1,48 @@
+import re
 import sqlite3
 from flask import g, current_app
+from app.ConnectionPool import pool, open_connection
+
+_CREATE_INDEX = re.compile(r'^CREATE\s+(UNIQUE\s+)?INDEX\b', re.IGNORECASE)
+
+
+def _successeur(prefixe):
+    """
+    Plus petite chaîne supérieure à toutes celles qui commencent par prefixe
+    (borne exclue de l'intervalle), None s'il n'y en a pas.
+    Les demi-codets (U+D800 à U+DFFF) ne s'encodent pas en UTF-8 : sautés.
+    """
+    while prefixe:
+        code = ord(prefixe[-1])
+        if code == 0xD7FF:
+            return prefixe[:-1] + chr(0xE000)
+        if code < 0x10FFFF:
+            return prefixe[:-1] + chr(code + 1)
+        # Dernier caractère maximal : on remonte d'un caractère
+        prefixe = prefixe[:-1]
+    return None
 
 class DonneeDAO:
     def __init__(self):
         pass
 
-    def get_db(self):
-        """Récupère la connexion à la base stockée dans g"""
-        db = getattr(g, '_database', None)
+    def get_db(self, readonly=False):
+        """
+        Récupère la connexion à la base stockée dans g.
+        Avec SQLITE_TUNING, la connexion vient du pool du thread et les
+        lectures passent par une connexion en lecture seule.
+        """
+        tuning = current_app.config.get('SQLITE_TUNING')
+        attr = '_database_ro' if readonly and tuning else '_database'
+        db = getattr(g, attr, None)
         if db is None:
             # On utilise le chemin défini dans la config de l'app
-            db = g._database = sqlite3.connect(current_app.config['DATABASE'])
-            db.row_factory = sqlite3.Row
+            path = current_app.config['DATABASE']
+            if tuning:
+                db = pool.acquire(path, readonly, current_app.config)
+            else:
+                db = open_connection(path, config=current_app.config)
+            setattr(g, attr, db)
         return db
 
     def check_data_integrity(self):
@@ -19,7 +50,7 @@ class DonneeDAO:
         Vérifie si la base contient suffisamment de données pour fonctionner.
         Retourne True si OK, False sinon.
         """
-        db = self.get_db()
+        db = self.get_db(readonly=True)
         cursor = db.cursor()
         
         try:
@@ -41,25 +72,300 @@ class DonneeDAO:
 
     def get_all_departements(self):
         """Récupère la liste des acronymes de département"""
-        db = self.get_db()
+        db = self.get_db(readonly=True)
         cursor = db.cursor()
         cursor.execute("SELECT acronyme FROM departement WHERE acronyme NOT IN ('FC', 'P_CJ_GEA') ORDER BY acronyme")
         return [row['acronyme'] for row in cursor.fetchall()]
 
     def get_all_annees(self):
         """Récupère la liste des acronymes de département"""
-        db = self.get_db()
+        db = self.get_db(readonly=True)
         cursor = db.cursor()
         cursor.execute("SELECT DISTINCT annee_universitaire FROM inscription ORDER BY annee_universitaire")
         return [str(row['annee_universitaire']) for row in cursor.fetchall()]
 
-    def search_etudiants(self, annee_debut, dept, rythme):
-        """Recherche dynamique selon les critères"""
-        db = self.get_db()
+    def search_etudiants(self, annee_debut, dept, rythme, limit=None, apres=None, avant=None):
+        """
+        Recherche dynamique selon les critères.
+        Pagination par clé (ine, annee_universitaire) : apres / avant sont
+        la clé de la dernière / première ligne de la page voisine.
+        Avec avant, les lignes sont retournées en ordre décroissant.
+        """
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_search_query(annee_debut, dept, rythme, limit, apres, avant)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    def iter_search_etudiants(self, annee_debut, dept, rythme, taille_lot):
+        """
+        Même recherche que search_etudiants, lue par lots (fetchmany) :
+        générateur de listes de lignes, pour les exports en flux.
+        """
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_search_query(annee_debut, dept, rythme)
+        cursor.execute(query, params)
+        try:
+            while True:
+                lot = cursor.fetchmany(taille_lot)
+                if not lot:
+                    break
+                yield lot
+        finally:
+            cursor.close()
+
+    def count_etudiants(self, annee_debut, dept, rythme):
+        """Nombre total de lignes de la recherche (sans jointure sur etudiant / decision)"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_count_query(annee_debut, dept, rythme)
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+    def get_cohort_stats(self, annee_debut, dept, rythme):
+        """Lit les agrégats précalculés (table stat_cohorte uniquement)"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_cohort_stats_query(annee_debut, dept, rythme)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    def iter_cohort_stats(self, annee_debut, dept, rythme, taille_lot):
+        """
+        Mêmes agrégats que get_cohort_stats, lus par lots (fetchmany) :
+        générateur de listes de lignes, pour les exports en flux.
+        """
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_cohort_stats_query(annee_debut, dept, rythme)
+        cursor.execute(query, params)
+        try:
+            while True:
+                lot = cursor.fetchmany(taille_lot)
+                if not lot:
+                    break
+                yield lot
+        finally:
+            cursor.close()
+
+    def _build_cohort_stats_query(self, annee_debut, dept, rythme):
+        params = []
+        sql_conditions = "WHERE 1 = 1"
+
+        if annee_debut is not None:
+            sql_conditions += " AND annee_debut = ?"
+            params.append(annee_debut)
+
+        if dept != "TOUS":
+            sql_conditions += " AND dept = ?"
+            params.append(dept)
+
+        if rythme != "TOUS":
+            sql_conditions += " AND rythme = ?"
+            params.append(rythme)
+
+        query = f"""
+        SELECT annee_debut, dept, rythme, annee_but, decision, nb
+        FROM stat_cohorte
+        {sql_conditions}
+        ORDER BY annee_debut, dept, rythme, annee_but, decision;
+        """
+        return query, params
+
+    def get_trajectoires(self, annee_debut, dept, rythme):
+        """Chemins distincts d'une cohorte avec leur effectif (table trajectoire)"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        params = [annee_debut]
+        sql_conditions = "WHERE annee_debut = ?"
+
+        if dept != "TOUS":
+            sql_conditions += " AND dept = ?"
+            params.append(dept)
+
+        if rythme != "TOUS":
+            sql_conditions += " AND rythme = ?"
+            params.append(rythme)
+
+        cursor.execute(f"""
+        SELECT chemin, COUNT(*) AS nb
+        FROM trajectoire
+        {sql_conditions}
+        GROUP BY chemin;
+        """, params)
+        return cursor.fetchall()
+
+    def get_stat_annees(self):
+        """Années de début de cohorte disponibles dans les agrégats"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+        cursor.execute("SELECT DISTINCT annee_debut FROM stat_cohorte ORDER BY annee_debut")
+        return [str(row['annee_debut']) for row in cursor.fetchall()]
+
+    def get_rejets_par_motif(self):
+        """Enregistrements écartés à l'import, comptés par motif"""
+        db = self.get_db(readonly=True)
         cursor = db.cursor()
+        cursor.execute("""
+        SELECT motif, COUNT(*) AS nb,
+               COUNT(DISTINCT id_fichier) AS nb_fichiers,
+               COUNT(DISTINCT etudid) AS nb_etudiants
+        FROM rejet
+        GROUP BY motif
+        ORDER BY nb DESC;
+        """)
+        return cursor.fetchall()
+
+    def get_rejets_par_fichier(self, limit):
+        """Fichiers qui produisent le plus de rejets, par motif"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+        cursor.execute("""
+        SELECT f.chemin AS fichier, r.motif, COUNT(*) AS nb
+        FROM rejet r
+        LEFT JOIN fichier_source f ON f.id_fichier = r.id_fichier
+        GROUP BY r.id_fichier, r.motif
+        ORDER BY nb DESC, fichier
+        LIMIT ?;
+        """, (limit,))
+        return cursor.fetchall()
+
+    def iter_rejets(self, taille_lot):
+        """
+        Tous les rejets (fichier, motif, etudid, année, détail, fichier retenu), lus par lots pour l'export.
+        fichier_retenu : pour un doublon ou un conflit, fichier de l'inscription gardée à sa place.
+        """
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+        cursor.execute("""
+        SELECT f.chemin AS fichier, r.motif, r.etudid, r.annee_universitaire, r.detail,
+               fr.chemin AS fichier_retenu
+        FROM rejet r
+        LEFT JOIN fichier_source f ON f.id_fichier = r.id_fichier
+        LEFT JOIN inscription i ON i.id_inscription = r.id_inscription
+        LEFT JOIN fichier_source fr ON fr.id_fichier = i.id_fichier
+        ORDER BY f.chemin, r.id_rejet;
+        """)
+        try:
+            while True:
+                lot = cursor.fetchmany(taille_lot)
+                if not lot:
+                    break
+                yield lot
+        finally:
+            cursor.close()
+
+    def find_etudiants(self, prefixe, limit):
+        """
+        Fiches des étudiants dont l'INE (etudid) commence par prefixe, en une requête :
+        une ligne par (étudiant, inscription, compétence évaluée).
+        Le préfixe devient un intervalle [prefixe, successeur[ lu sur l'index
+        UNIQUE de etudiant.ine ; inscriptions et moyennes suivent par leurs index.
+        limit borne le nombre d'étudiants (les lignes sont triées par INE).
+        """
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_lookup_query(prefixe, limit)
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    def explain_lookup(self, prefixe, limit):
+        """Plan d'exécution de la recherche d'un étudiant"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_lookup_query(prefixe, limit)
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        return [row['detail'] for row in cursor.fetchall()]
+
+    def _build_lookup_query(self, prefixe, limit):
+        # INE en casse d'origine, etudid hexadécimaux en minuscules : les deux variantes
+        variantes = list(dict.fromkeys([prefixe, prefixe.lower()]))
+        conditions = []
+        params = []
+        for v in variantes:
+            fin = _successeur(v)
+            if fin is None:
+                conditions.append("(ine >= ?)")
+                params.append(v)
+            else:
+                conditions.append("(ine >= ? AND ine < ?)")
+                params += [v, fin]
+        conditions = " OR ".join(conditions)
+        params.append(limit)
+
+        query = f"""
+        WITH cible AS (
+            SELECT id_etudiant, ine
+            FROM etudiant
+            WHERE {conditions}
+            ORDER BY ine
+            LIMIT ?
+        )
+        SELECT
+            c.ine,
+            t.chemin,
+            i.id_inscription,
+            i.annee_universitaire,
+            f.annee_but,
+            d.acronyme AS dept,
+            r.acronyme AS rythme,
+            et.acronyme AS etat,
+            dec.acronyme AS resultat,
+            comp.nom AS competence,
+            comp.acronyme AS competence_acronyme,
+            dec_comp.acronyme AS competence_resultat,
+            ev.moyenne
+        FROM cible c
+        LEFT JOIN trajectoire t ON t.id_etudiant = c.id_etudiant
+        LEFT JOIN inscription i ON i.id_etudiant = c.id_etudiant
+        LEFT JOIN formation f ON i.id_formation = f.id_formation
+        LEFT JOIN departement d ON f.id_departement = d.id_departement
+        LEFT JOIN rythme r ON f.id_rythme = r.id_rythme
+        LEFT JOIN etat et ON i.id_etat = et.id_etat
+        LEFT JOIN decision dec ON i.id_decision = dec.id_decision
+        LEFT JOIN evaluer ev ON ev.id_inscription = i.id_inscription
+        LEFT JOIN competence comp ON ev.id_competence = comp.id_competence
+        LEFT JOIN decision dec_comp ON ev.id_decision = dec_comp.id_decision
+        ORDER BY c.ine, i.annee_universitaire, comp.acronyme
+        """
+        return query, params
+
+    def explain_search(self, annee_debut, dept, rythme, limit=None, apres=None, avant=None):
+        """Retourne le plan d'exécution (EXPLAIN QUERY PLAN) de la recherche, éventuellement paginée"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_search_query(annee_debut, dept, rythme, limit, apres, avant)
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        return [row['detail'] for row in cursor.fetchall()]
+
+    def explain_count(self, annee_debut, dept, rythme):
+        """Plan d'exécution du comptage des lignes de la recherche"""
+        db = self.get_db(readonly=True)
+        cursor = db.cursor()
+
+        query, params = self._build_count_query(annee_debut, dept, rythme)
+        cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+        return [row['detail'] for row in cursor.fetchall()]
 
+    def _build_cohort_cte(self, annee_debut, dept, rythme):
+        """
+        Construit le CTE "cible" de la cohorte.
+        Les couples (annee_universitaire, id_formation) attendus sont calculés
+        d'abord sur la petite table formation, puis inscription est lue
+        par l'index idx_inscription_formation_annee (pas de parcours complet).
+        """
         params = [annee_debut]
-        sql_conditions = "WHERE i.annee_universitaire = ? + (f.annee_but - 1)"
+        sql_conditions = "WHERE 1 = 1"
 
         if dept != "TOUS":
             sql_conditions += " AND d.acronyme = ?"
@@ -71,30 +377,172 @@ class DonneeDAO:
             elif rythme == "FA":
                 sql_conditions += " AND f.id_rythme = 2"
 
+        cte = f"""
+        WITH cible AS (
+            SELECT 
+                f.id_formation,
+                ? + (f.annee_but - 1) AS annee_universitaire,
+                f.annee_but,
+                d.acronyme as dept,
+                r.acronyme as rythme
+            FROM formation f
+            JOIN departement d ON f.id_departement = d.id_departement
+            JOIN rythme r ON f.id_rythme = r.id_rythme
+            {sql_conditions}
+        )"""
+        return cte, params
+
+    def _build_search_query(self, annee_debut, dept, rythme, limit=None, apres=None, avant=None):
+        """Construit la requête de recherche, éventuellement paginée"""
+        cible, params = self._build_cohort_cte(annee_debut, dept, rythme)
+
+        pagination = ""
+        ordre = "ASC"
+        if apres is not None:
+            pagination = "WHERE (e.ine, i.annee_universitaire) > (?, ?)"
+            params.extend(apres)
+        elif avant is not None:
+            pagination = "WHERE (e.ine, i.annee_universitaire) < (?, ?)"
+            params.extend(avant)
+            ordre = "DESC"
+
+        limite = ""
+        if limit is not None:
+            limite = "LIMIT ?"
+            params.append(limit)
+
+        # CROSS JOIN : SQLite garde cet ordre de jointure (cible d'abord)
         query = f"""
+        {cible}
         SELECT 
             e.ine,
             i.annee_universitaire,
-            f.annee_but,
+            c.annee_but,
             dec.acronyme as resultat,
-            d.acronyme as dept,
-            r.acronyme as rythme
-        FROM inscription i
-        JOIN formation f ON i.id_formation = f.id_formation
-        JOIN departement d ON f.id_departement = d.id_departement
+            c.dept,
+            c.rythme
+        FROM cible c
+        CROSS JOIN inscription i
+            ON i.id_formation = c.id_formation
+            AND i.annee_universitaire = c.annee_universitaire
         JOIN etudiant e ON i.id_etudiant = e.id_etudiant
-        JOIN rythme r ON f.id_rythme = r.id_rythme
         LEFT JOIN decision dec ON i.id_decision = dec.id_decision
-        {sql_conditions}
-        ORDER BY e.ine;
+        {pagination}
+        ORDER BY e.ine {ordre}, i.annee_universitaire {ordre}
+        {limite};
         """
-        
-        cursor.execute(query, params)
-        return cursor.fetchall()
+        return query, params
+
+    def _build_count_query(self, annee_debut, dept, rythme):
+        """Comptage de la recherche (sans jointure sur etudiant / decision)"""
+        cible, params = self._build_cohort_cte(annee_debut, dept, rythme)
+        query = f"""
+        {cible}
+        SELECT COUNT(*)
+        FROM cible c
+        CROSS JOIN inscription i
+            ON i.id_formation = c.id_formation
+            AND i.annee_universitaire = c.annee_universitaire;
+        """
+        return query, params
     
+    def get_generation(self):
+        """
+        Génération des données (PRAGMA user_version, dans l'en-tête du fichier).
+        Incrémentée à chaque initialisation et synchronisation qui modifie les données, elle est
+        visible de tous les processus qui partagent la base.
+        """
+        db = self.get_db(readonly=True)
+        return db.execute("PRAGMA user_version").fetchone()[0]
+
+    def bump_generation(self, cursor):
+        """Incrémente la génération dans la transaction en cours"""
+        cursor.execute("PRAGMA user_version")
+        generation = cursor.fetchone()[0] + 1
+        cursor.execute(f"PRAGMA user_version = {int(generation)}")
+
+    def schema_statements(self):
+        """
+        Instructions de schema.sql, séparées en (tables, index secondaires).
+        Les PRAGMA du script sont écartés : la base de reconstruction règle les siens.
+        """
+        tables, index = [], []
+        courante = ""
+        with current_app.open_resource('schema.sql', mode='r') as f:
+            for ligne in f:
+                if not courante and (not ligne.strip() or ligne.lstrip().startswith('--')):
+                    continue
+                courante += ligne
+                if sqlite3.complete_statement(courante):
+                    instruction = courante.strip()
+                    courante = ""
+                    if _CREATE_INDEX.match(instruction):
+                        index.append(instruction)
+                    elif not instruction.upper().startswith('PRAGMA'):
+                        tables.append(instruction)
+        return tables, index
+
+    def open_staging_db(self, path):
+        """
+        Ouvre une base de reconstruction vide : tables sans index secondaires,
+        clés étrangères non vérifiées pendant le chargement, journal et fsync
+        désactivés (le fichier est jeté si la reconstruction échoue).
+        Retourne (connexion, instructions CREATE INDEX à jouer après le chargement).
+        """
+        config = current_app.config
+        db = open_connection(path, config={'METRICS': config.get('METRICS')})
+        db.execute("PRAGMA journal_mode = OFF")
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute("PRAGMA foreign_keys = OFF")
+        db.execute("PRAGMA locking_mode = EXCLUSIVE")
+        db.execute("PRAGMA temp_store = MEMORY")
+        db.execute(f"PRAGMA cache_size = -{int(config.get('SQLITE_CACHE_KIB', 0))}")
+
+        tables, index = self.schema_statements()
+        for instruction in tables:
+            db.execute(instruction)
+        db.commit()
+        return db, index
+
+    def build_indexes(self, db, index):
+        """Crée les index secondaires en une passe, une fois les tables remplies"""
+        for instruction in index:
+            db.execute(instruction)
+        db.commit()
+
+    def foreign_key_violations(self, db):
+        """Vérification différée des clés étrangères : nombre de lignes orphelines"""
+        return len(db.execute("PRAGMA foreign_key_check").fetchall())
+
+    def swap_in(self, staging):
+        """
+        Remplace le contenu de la base de l'application par la base de reconstruction,
+        page par page, en une seule transaction (API de sauvegarde SQLite) :
+        les lecteurs voient l'ancienne base jusqu'à la validation, puis la nouvelle.
+        La copie refuse une destination en transaction et prend elle-même le verrou
+        d'écriture : la génération définitive est donc lue et incrémentée sous
+        BEGIN IMMEDIATE juste après, jamais à partir d'une valeur lue plus tôt.
+        """
+        db = self.get_db()
+        if db.in_transaction:
+            db.commit()
+        # Génération provisoire de la copie, au-dessus de la génération courante
+        generation = db.execute("PRAGMA user_version").fetchone()[0] + 1
+        staging.execute(f"PRAGMA user_version = {int(generation)}")
+        staging.commit()
+        staging.backup(db)
+        # Un autre écrivain a pu passer entre la lecture et la copie : la génération
+        # définitive ne peut pas être une valeur qu'il a déjà publiée
+        db.execute("BEGIN IMMEDIATE")
+        self.bump_generation(db.cursor())
+        db.commit()
+
     def init_db(self):
         """Exécute le script schema.sql"""
         db = self.get_db()
         with current_app.open_resource('schema.sql', mode='r') as f:
             db.cursor().executescript(f.read())
+        # executescript valide tout : la génération est relue sous verrou d'écriture
+        db.execute("BEGIN IMMEDIATE")
+        self.bump_generation(db.cursor())
         db.commit()
\ No newline at end of file
@@ -9,4 +9,74 @@ class EtudiantView:
         self.annee_but = annee_but
         self.resultat = resultat
         self.dept = dept
-        self.rythme = rythme
\ No newline at end of file
+        self.rythme = rythme
+
+    def to_dict(self):
+        return {
+            "ine": self.ine,
+            "annee_univ": self.annee_univ,
+            "annee_but": self.annee_but,
+            "resultat": self.resultat,
+            "dept": self.dept,
+            "rythme": self.rythme,
+        }
+
+class PageEtudiants:
+    """
+    Une page de résultats de recherche pour index.html :
+    les EtudiantView de la page, le nombre total de lignes
+    et les curseurs opaques vers les pages voisines (None si absentes).
+    """
+    def __init__(self, results, total, suivant=None, precedent=None):
+        self.results = results
+        self.total = total
+        self.suivant = suivant
+        self.precedent = precedent
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "suivant": self.suivant,
+            "precedent": self.precedent,
+            "resultats": [r.to_dict() for r in self.results],
+        }
+
+class FicheEtudiant:
+    """
+    Tout le parcours d'un étudiant pour la vue etudiant.html :
+    ses inscriptions (InscriptionView, par année) et le chemin
+    précalculé de sa trajectoire.
+    """
+    def __init__(self, ine, chemin=None):
+        self.ine = ine
+        self.chemin = chemin
+        self.inscriptions = []
+
+    def to_dict(self):
+        return {
+            "ine": self.ine,
+            "chemin": self.chemin,
+            "inscriptions": [i.to_dict() for i in self.inscriptions],
+        }
+
+class InscriptionView:
+    """Une année d'un étudiant, avec ses moyennes de compétences (RCUE)"""
+    def __init__(self, annee_univ, annee_but, dept, rythme, etat, resultat):
+        self.annee_univ = annee_univ
+        self.annee_but = annee_but
+        self.dept = dept
+        self.rythme = rythme
+        self.etat = etat
+        self.resultat = resultat
+        self.competences = []
+
+    def to_dict(self):
+        return {
+            "annee_univ": self.annee_univ,
+            "annee_but": self.annee_but,
+            "dept": self.dept,
+            "rythme": self.rythme,
+            "etat": self.etat,
+            "resultat": self.resultat,
+            "competences": self.competences,
+        }
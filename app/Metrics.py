@@ -0,0 +1,241 @@
+import os
+import re
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Littéraux remplacés par ? pour regrouper les requêtes identiques
+_LITTERAUX = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTES = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ESPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Texte normalisé d'une requête : espaces réduits, littéraux et listes IN (?, ?, ...) repliés"""
+    sql = _ESPACES.sub(' ', sql).strip()
+    sql = _LITTERAUX.sub('?', sql)
+    return _LISTES.sub('(?)', sql)
+
+
+class Metrics:
+    """
+    Compteurs de l'application, exposés au format texte Prometheus.
+      - étapes de la dernière synchronisation : durée, lignes, fichiers ;
+      - requêtes SQL (si activé) : appels, durée cumulée et lignes par texte normalisé ;
+      - requêtes HTTP (si activé) : appels et durée cumulée par endpoint.
+    Désactivé, seules les étapes de synchronisation sont enregistrées
+    (quelques entrées par synchro) : les connexions SQLite restent des
+    connexions ordinaires, sans aucun coût par requête.
+    Les compteurs SQL et HTTP sont ceux du processus : sous gunicorn, chaque
+    worker a les siens (étiquetés par pid à l'exposition, voir prometheus).
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._etapes = {}
+        self._sql = {}
+        self._http = {}
+
+    # Étapes de synchronisation
+
+    @contextmanager
+    def etape(self, nom):
+        """
+        Chronomètre une étape : with metrics.etape('x') as e: ...; e['lignes'] = n
+        Le dictionnaire produit est aussi retourné par etapes().
+        """
+        mesure = {"etape": nom, "duree": 0.0, "lignes": 0, "fichiers": 0}
+        debut = time.perf_counter()
+        try:
+            yield mesure
+        finally:
+            mesure["duree"] = round(time.perf_counter() - debut, 4)
+            with self._lock:
+                self._etapes[nom] = mesure
+
+    def reset_etapes(self):
+        with self._lock:
+            self._etapes = {}
+
+    def etapes(self):
+        with self._lock:
+            return [dict(m) for m in self._etapes.values()]
+
+    # SQL
+
+    def record_sql(self, sql, duree, lignes, appel=True):
+        cle = normalize_sql(sql)
+        with self._lock:
+            compteur = self._sql.get(cle)
+            if compteur is None:
+                compteur = self._sql[cle] = [0, 0.0, 0]
+            compteur[0] += appel
+            compteur[1] += duree
+            compteur[2] += lignes
+
+        # Cumul pour l'en-tête de la requête HTTP en cours (thread courant)
+        requete = getattr(self._local, 'requete', None)
+        if requete is not None:
+            requete[0] += appel
+            requete[1] += duree
+
+    # HTTP
+
+    def debut_requete(self):
+        self._local.requete = [0, 0.0, time.perf_counter()]
+
+    def fin_requete(self, endpoint):
+        """Retourne (nb requêtes SQL, durée SQL, durée totale) de la requête HTTP du thread"""
+        requete = getattr(self._local, 'requete', None)
+        if requete is None:
+            return None
+        self._local.requete = None
+        nb_sql, duree_sql, debut = requete
+        total = time.perf_counter() - debut
+        with self._lock:
+            compteur = self._http.setdefault(endpoint or 'inconnu', [0, 0.0])
+            compteur[0] += 1
+            compteur[1] += total
+        return nb_sql, duree_sql, total
+
+    # Exposition
+
+    def reset(self):
+        with self._lock:
+            self._etapes = {}
+            self._sql = {}
+            self._http = {}
+
+    def prometheus(self, extra=None, etapes=None):
+        """
+        Texte d'exposition Prometheus (version 0.0.4).
+        extra : {nom: (type, aide, valeur)} pour des jauges calculées à la demande.
+        etapes : étapes de synchronisation à exposer à la place de celles du processus
+        (la dernière synchro a pu tourner dans un autre worker).
+        """
+        with self._lock:
+            if etapes is None:
+                etapes = [dict(m) for m in self._etapes.values()]
+            sql = {k: list(v) for k, v in self._sql.items()}
+            http = {k: list(v) for k, v in self._http.items()}
+
+        lignes = []
+
+        def famille(nom, type_, aide, valeurs):
+            lignes.append(f"# HELP {nom} {aide}")
+            lignes.append(f"# TYPE {nom} {type_}")
+            for labels, valeur in valeurs:
+                texte = ','.join(f'{k}="{_echapper(v)}"' for k, v in labels.items())
+                lignes.append(f"{nom}{{{texte}}} {valeur}" if texte else f"{nom} {valeur}")
+
+        # Compteurs propres au processus : le pid distingue les workers gunicorn
+        pid = {"pid": os.getpid()}
+
+        famille("scolarite_sync_etape_secondes", "gauge", "Durée de chaque étape de la dernière synchronisation",
+                [({"etape": m["etape"]}, m["duree"]) for m in etapes])
+        famille("scolarite_sync_etape_lignes", "gauge", "Lignes traitées par étape lors de la dernière synchronisation",
+                [({"etape": m["etape"]}, m["lignes"]) for m in etapes])
+        famille("scolarite_sync_etape_fichiers", "gauge", "Fichiers traités par étape lors de la dernière synchronisation",
+                [({"etape": m["etape"]}, m["fichiers"]) for m in etapes])
+
+        famille("scolarite_sql_requetes_total", "counter", "Exécutions par requête SQL normalisée",
+                [(dict(pid, requete=k), v[0]) for k, v in sql.items()])
+        famille("scolarite_sql_secondes_total", "counter", "Temps cumulé (exécution et lecture) par requête SQL normalisée",
+                [(dict(pid, requete=k), round(v[1], 6)) for k, v in sql.items()])
+        famille("scolarite_sql_lignes_total", "counter", "Lignes lues ou modifiées par requête SQL normalisée",
+                [(dict(pid, requete=k), v[2]) for k, v in sql.items()])
+
+        famille("scolarite_http_requetes_total", "counter", "Requêtes HTTP par endpoint",
+                [(dict(pid, endpoint=k), v[0]) for k, v in http.items()])
+        famille("scolarite_http_secondes_total", "counter", "Temps cumulé des requêtes HTTP par endpoint",
+                [(dict(pid, endpoint=k), round(v[1], 6)) for k, v in http.items()])
+
+        for nom, (type_, aide, valeur) in (extra or {}).items():
+            famille(nom, type_, aide, [(pid, valeur)])
+
+        return '\n'.join(lignes) + '\n'
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Curseur qui mesure chaque exécution et chaque lecture de résultats"""
+
+    def execute(self, sql, parameters=()):
+        debut = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._sql = sql
+            metrics.record_sql(sql, time.perf_counter() - debut, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        debut = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._sql = sql
+            metrics.record_sql(sql, time.perf_counter() - debut, max(self.rowcount, 0))
+
+    def executescript(self, sql_script):
+        debut = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._sql = None
+            metrics.record_sql("<script>", time.perf_counter() - debut, 0)
+
+    def fetchone(self):
+        debut = time.perf_counter()
+        row = super().fetchone()
+        self._lecture(debut, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        debut = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._lecture(debut, len(rows))
+        return rows
+
+    def fetchall(self):
+        debut = time.perf_counter()
+        rows = super().fetchall()
+        self._lecture(debut, len(rows))
+        return rows
+
+    def __next__(self):
+        debut = time.perf_counter()
+        row = super().__next__()
+        self._lecture(debut, 1)
+        return row
+
+    def _lecture(self, debut, lignes):
+        sql = getattr(self, '_sql', None)
+        if sql:
+            metrics.record_sql(sql, time.perf_counter() - debut, lignes, appel=False)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connexion dont tous les curseurs (y compris ceux de execute) sont instrumentés"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+# Instance partagée par le processus
+metrics = Metrics()
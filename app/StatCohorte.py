@@ -0,0 +1,54 @@
+# Regroupement des codes de décision pour le suivi de cohorte
+DECISIONS_REUSSITE = ('ADM', 'ADSUP', 'CMP', 'PASD', 'PAS1NCI', 'V', 'VAL', 'VCA', 'VCC', 'ADM-INC')
+DECISIONS_ABANDON = ('DEM', 'DEF', 'ABAN')
+DECISIONS_REDOUBLEMENT = ('RED', 'NAR')
+
+
+class StatCohorteView:
+    """
+    Objet de transfert de données (DTO) pour l'affichage
+    dans la vue stats.html : une ligne cohorte x dept x rythme x niveau
+    """
+    def __init__(self, annee_debut, dept, rythme, annee_but):
+        self.annee_debut = annee_debut
+        self.dept = dept
+        self.rythme = rythme
+        self.annee_but = annee_but
+        self.decisions = {}
+
+    def ajouter(self, decision, nb):
+        self.decisions[decision] = self.decisions.get(decision, 0) + nb
+
+    @property
+    def effectif(self):
+        return sum(self.decisions.values())
+
+    @property
+    def reussites(self):
+        return sum(nb for dec, nb in self.decisions.items() if dec in DECISIONS_REUSSITE)
+
+    @property
+    def abandons(self):
+        return sum(nb for dec, nb in self.decisions.items() if dec in DECISIONS_ABANDON)
+
+    @property
+    def redoublements(self):
+        return sum(nb for dec, nb in self.decisions.items() if dec in DECISIONS_REDOUBLEMENT)
+
+    @property
+    def taux_reussite(self):
+        return round(100 * self.reussites / self.effectif, 1) if self.effectif else 0.0
+
+    def to_dict(self):
+        return {
+            "annee_debut": self.annee_debut,
+            "dept": self.dept,
+            "rythme": self.rythme,
+            "annee_but": self.annee_but,
+            "effectif": self.effectif,
+            "reussites": self.reussites,
+            "abandons": self.abandons,
+            "redoublements": self.redoublements,
+            "taux_reussite": self.taux_reussite,
+            "decisions": self.decisions,
+        }
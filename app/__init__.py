@@ -1,5 +1,7 @@
 import os
-from flask import Flask, g
+from flask import Flask, g, request
+from app.ConnectionPool import pool
+from app.Metrics import metrics
 
 def create_app():
     # Configuration des chemins
@@ -12,6 +14,29 @@ def create_app():
     
     app = Flask(__name__, instance_path=INSTANCE_DIR)
     app.config['DATABASE'] = DB_PATH
+    # État des synchronisations, partagé par tous les processus du serveur
+    app.config['JOBS_DATABASE'] = os.path.join(INSTANCE_DIR, 'sync_jobs.db')
+    # SCOLARITE_ENV=production : pas de mode debug ni de rechargement automatique
+    app.config['ENV_NAME'] = os.environ.get('SCOLARITE_ENV', 'developpement')
+    app.config['DEBUG'] = app.config['ENV_NAME'] != 'production'
+    # Nombre de lignes écrites par lot lors de l'import
+    app.config['IMPORT_BATCH_SIZE'] = 5000
+    # Processus de décodage des JSON (1 = import séquentiel)
+    app.config['IMPORT_WORKERS'] = int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 1))
+    # Lignes par page dans le tableau de résultats
+    app.config['PAGE_SIZE'] = 100
+    # Couche de connexion SQLite : WAL, pragmas et connexions réutilisées par thread
+    app.config['SQLITE_TUNING'] = os.environ.get('SQLITE_TUNING', '1') == '1'
+    app.config['SQLITE_CACHE_KIB'] = 64 * 1024
+    app.config['SQLITE_MMAP_SIZE'] = 256 * 1024 * 1024
+    # Nombre de recherches récentes gardées en cache (LRU)
+    app.config['CACHE_SEARCH_SIZE'] = 256
+    # Durée (s) pendant laquelle navigateurs et proxys réutilisent une réponse de /api/etudiants
+    app.config['API_MAX_AGE'] = 30
+    # Mesure des requêtes SQL et HTTP (exposées sur /metrics) ; désactivée, aucun coût par requête
+    app.config['METRICS'] = os.environ.get('METRICS', '0') == '1'
+    # En-tête Server-Timing (temps SQL / total) sur chaque réponse, si METRICS
+    app.config['METRICS_TIMING_HEADER'] = os.environ.get('METRICS_TIMING_HEADER', '1') == '1'
 
     # S'assurer que le dossier instance existe
     try:
@@ -22,15 +47,47 @@ def create_app():
     # Enregistrement des Blueprints (Contrôleurs)
     from app.controllers.IndexController import index_bp
     from app.controllers.SynchroController import synchro_bp
+    from app.controllers.StatsController import stats_bp
+    from app.controllers.MetricsController import metrics_bp
+    from app.controllers.EtudiantController import etudiant_bp
     
     app.register_blueprint(index_bp)
     app.register_blueprint(synchro_bp)
+    app.register_blueprint(stats_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(etudiant_bp)
 
-    # Gestion fermeture connexion DB
+    # Taille du cache des recherches
+    from app.services.Cache import cache
+    cache.max_entries = app.config['CACHE_SEARCH_SIZE']
+
+    # Instrumentation des requêtes HTTP (seulement si METRICS)
+    metrics.enabled = app.config['METRICS']
+    if app.config['METRICS']:
+        @app.before_request
+        def debut_mesure():
+            metrics.debut_requete()
+
+        @app.after_request
+        def fin_mesure(response):
+            mesure = metrics.fin_requete(request.endpoint)
+            if mesure and app.config['METRICS_TIMING_HEADER']:
+                nb_sql, duree_sql, total = mesure
+                # Valeur d'en-tête en ASCII uniquement (latin-1 au mieux selon les clients)
+                response.headers['Server-Timing'] = (f'sql;dur={duree_sql * 1000:.2f};desc="{nb_sql} requetes", '
+                                                     f'total;dur={total * 1000:.2f}')
+            return response
+
+    # Gestion fermeture connexion DB (rendue au pool si SQLITE_TUNING)
     @app.teardown_appcontext
     def close_connection(exception):
-        db = getattr(g, '_database', None)
-        if db is not None:
-            db.close()
+        for attr in ('_database', '_database_ro'):
+            db = getattr(g, attr, None)
+            if db is None:
+                continue
+            if app.config['SQLITE_TUNING']:
+                pool.release(db)
+            else:
+                db.close()
 
     return app
\ No newline at end of file
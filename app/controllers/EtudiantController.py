@@ -0,0 +1,38 @@
+from flask import Blueprint, render_template, request, jsonify
+from app.services.DonneeService import DonneeService
+import sqlite3
+
+etudiant_bp = Blueprint('etudiant', __name__)
+
+
+@etudiant_bp.route('/etudiant', methods=['GET'])
+def fiche():
+    """Recherche d'un étudiant par début d'INE / etudid : ?q=8120927"""
+    prefixe = request.args.get('q', '').strip()
+    fiches, tronque = [], False
+    db_error = False
+
+    try:
+        fiches, tronque = DonneeService().find_etudiants(prefixe)
+    except sqlite3.OperationalError as e:
+        db_error = True
+        print(f"Erreur critique d'accès BDD : {e}")
+
+    return render_template('etudiant.html', q=prefixe, fiches=fiches,
+                           tronque=tronque, db_error=db_error)
+
+@etudiant_bp.route('/api/etudiant', methods=['GET'])
+def fiche_json():
+    """Mêmes fiches au format JSON"""
+    prefixe = request.args.get('q', '').strip()
+    if not prefixe:
+        return jsonify(erreur="Paramètre q manquant"), 400
+    if not DonneeService.prefixe_valide(prefixe):
+        return jsonify(erreur="Paramètre q invalide : chiffres et lettres uniquement"), 400
+
+    try:
+        fiches, tronque = DonneeService().find_etudiants(prefixe)
+    except sqlite3.OperationalError as e:
+        return jsonify(erreur=str(e)), 503
+
+    return jsonify(tronque=tronque, etudiants=[f.to_dict() for f in fiches])
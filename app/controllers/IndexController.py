@@ -1,4 +1,6 @@
-from flask import Blueprint, render_template, request
+import hashlib
+from flask import Blueprint, render_template, request, Response, stream_with_context, abort, jsonify, current_app
+from app.services.ExportService import FORMATS
 from app.services.DonneeService import DonneeService
 import sqlite3
 
@@ -10,7 +12,7 @@ def index():
 
     departements = []
     annees = []
-    results = []
+    page = None
 
     db_error = False # État du système
 
@@ -33,22 +35,98 @@ def index():
     selected_year = ""
     selected_rythme = "TOUS"
 
-    if request.method == 'POST':
-        selected_dept = request.form.get('departement') 
-        selected_year = request.form.get('annee')
-        selected_rythme = request.form.get('rythme')
+    # Formulaire (POST) ou liens de pagination (GET avec paramètres)
+    if request.values.get('annee'):
+        selected_dept = request.values.get('departement', 'TOUS')
+        selected_year = request.values.get('annee')
+        selected_rythme = request.values.get('rythme', 'TOUS')
 
     try:
-        results = service.get_search_results(selected_year, selected_dept, selected_rythme)
+        page = service.get_search_page(selected_year, selected_dept, selected_rythme,
+                                       apres=request.args.get('apres'),
+                                       avant=request.args.get('avant'))
     except Exception:
-        results = []
+        page = None
 
     # On passe une liste d'objets au template
     return render_template('index.html', 
                            depts=departements,
                            annees=annees, 
-                           results=results, 
+                           page=page, 
                            sel_dept=selected_dept, 
                            sel_year=selected_year,
                            sel_rythme=selected_rythme,
-                           db_error=db_error)
\ No newline at end of file
+                           db_error=db_error)
+
+@index_bp.route('/api/etudiants', methods=['GET'])
+def api_etudiants():
+    """
+    Page de résultats en JSON pour le filtrage en direct :
+    ?annee=2022&departement=INFO&rythme=FI[&apres=...|&avant=...]
+    L'ETag dépend de la génération des données et des paramètres : un
+    If-None-Match identique reçoit un 304 sans qu'aucune recherche ne soit faite.
+    """
+    service = DonneeService()
+    annee = request.args.get('annee', '')
+    if not annee.isdigit():
+        return jsonify(erreur="Paramètre annee manquant ou invalide"), 400
+    dept = request.args.get('departement', 'TOUS')
+    rythme = request.args.get('rythme', 'TOUS')
+    apres = request.args.get('apres')
+    avant = request.args.get('avant')
+
+    try:
+        generation = service.get_generation()
+    except sqlite3.OperationalError as e:
+        return jsonify(erreur=str(e)), 503
+
+    cle = repr((annee, dept, rythme, apres, avant, current_app.config['PAGE_SIZE']))
+    etag = f"g{generation}-{hashlib.sha1(cle.encode()).hexdigest()[:16]}"
+    cache_control = f"public, max-age={current_app.config['API_MAX_AGE']}"
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        try:
+            page = service.get_search_page(annee, dept, rythme, apres=apres, avant=avant)
+        except sqlite3.OperationalError as e:
+            return jsonify(erreur=str(e)), 503
+        response = jsonify(page.to_dict() if page else {"total": 0, "suivant": None, "precedent": None, "resultats": []})
+
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+@index_bp.route('/export/etudiants.<fmt>', methods=['GET'])
+def export_etudiants(fmt):
+    """Export en flux des résultats de recherche : ?annee=2022&departement=INFO&rythme=FI"""
+    if fmt not in FORMATS:
+        abort(404)
+    annee = request.args.get('annee', '')
+    if not annee.isdigit():
+        abort(400)
+    dept = request.args.get('departement', 'TOUS')
+    rythme = request.args.get('rythme', 'TOUS')
+
+    contenu = DonneeService().export_search(fmt, annee, dept, rythme)
+    return _stream_response(contenu, fmt, f"etudiants_{annee}_{dept}_{rythme}")
+
+@index_bp.route('/export/cohortes.<fmt>', methods=['GET'])
+def export_cohortes(fmt):
+    """Export des statistiques de cohorte précalculées"""
+    if fmt not in FORMATS:
+        abort(404)
+    annee = request.args.get('annee', 'TOUS')
+    if annee != 'TOUS' and not annee.isdigit():
+        abort(400)
+    dept = request.args.get('departement', 'TOUS')
+    rythme = request.args.get('rythme', 'TOUS')
+
+    contenu = DonneeService().export_cohort_stats(fmt, annee, dept, rythme)
+    return _stream_response(contenu, fmt, f"cohortes_{annee}_{dept}_{rythme}")
+
+def _stream_response(contenu, fmt, nom):
+    """Réponse envoyée au fil de la lecture SQL (connexion gardée jusqu'à la fin)"""
+    mimetype, extension = FORMATS[fmt]
+    return Response(stream_with_context(contenu), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{nom}.{extension}"'})
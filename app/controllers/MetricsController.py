@@ -0,0 +1,27 @@
+from flask import Blueprint, Response
+from app.Metrics import metrics
+from app.services.DonneeService import DonneeService
+from app.services.SyncJobRunner import sync_runner
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def exposition():
+    """
+    Compteurs au format texte Prometheus (étapes de synchro, SQL, HTTP, cache).
+    Les étapes viennent de la dernière synchro terminée (table sync_job), identiques
+    sur tous les workers ; les autres compteurs sont ceux du worker qui répond.
+    """
+    cache = DonneeService().get_cache_stats()
+    extra = {
+        "scolarite_metrics_actives": ("gauge", "1 si la mesure SQL / HTTP est activée (METRICS=1)", int(metrics.enabled)),
+        "scolarite_cache_hits_total": ("counter", "Succès du cache applicatif", cache["hits"]),
+        "scolarite_cache_misses_total": ("counter", "Échecs du cache applicatif", cache["misses"]),
+        "scolarite_cache_evictions_total": ("counter", "Évictions de la LRU des recherches", cache["evictions"]),
+    }
+    if cache["generation"] is not None:
+        extra["scolarite_generation_donnees"] = ("gauge", "Génération des données (PRAGMA user_version)", cache["generation"])
+    # content_type tel quel : avec mimetype=, Flask ajouterait un second charset
+    return Response(metrics.prometheus(extra, sync_runner.dernieres_etapes()),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
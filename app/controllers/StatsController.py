@@ -0,0 +1,68 @@
+from flask import Blueprint, render_template, request, jsonify
+from app.services.DonneeService import DonneeService
+import sqlite3
+
+stats_bp = Blueprint('stats', __name__)
+
+
+def _read_filters():
+    """Filtres communs à la vue et à l'API (query string)"""
+    return (request.args.get('annee', 'TOUS'),
+            request.args.get('departement', 'TOUS'),
+            request.args.get('rythme', 'TOUS'))
+
+@stats_bp.route('/stats', methods=['GET'])
+def stats():
+    """Tableau de suivi de cohorte lu dans les agrégats précalculés"""
+    service = DonneeService()
+    selected_year, selected_dept, selected_rythme = _read_filters()
+
+    departements = []
+    annees = []
+    lignes = []
+    db_error = False
+
+    try:
+        departements = service.get_form_dept()
+        annees = service.get_stat_annees()
+        lignes = service.get_cohort_stats(selected_year, selected_dept, selected_rythme)
+    except sqlite3.OperationalError as e:
+        db_error = True
+        print(f"Erreur critique d'accès BDD : {e}")
+
+    return render_template('stats.html',
+                           depts=departements,
+                           annees=annees,
+                           lignes=lignes,
+                           sel_dept=selected_dept,
+                           sel_year=selected_year,
+                           sel_rythme=selected_rythme,
+                           db_error=db_error)
+
+@stats_bp.route('/stats/json', methods=['GET'])
+def stats_json():
+    """Mêmes agrégats au format JSON pour les tableaux de bord"""
+    service = DonneeService()
+    selected_year, selected_dept, selected_rythme = _read_filters()
+
+    try:
+        lignes = service.get_cohort_stats(selected_year, selected_dept, selected_rythme)
+    except sqlite3.OperationalError as e:
+        return jsonify(erreur=str(e)), 503
+
+    return jsonify([ligne.to_dict() for ligne in lignes])
+
+@stats_bp.route('/stats/flux', methods=['GET'])
+def flux():
+    """Flux de parcours (Sankey) d'une cohorte : ?annee=2021&departement=INFO&rythme=FI"""
+    service = DonneeService()
+    selected_year, selected_dept, selected_rythme = _read_filters()
+
+    try:
+        resultat = service.get_cohort_flows(selected_year, selected_dept, selected_rythme)
+    except sqlite3.OperationalError as e:
+        return jsonify(erreur=str(e)), 503
+
+    if resultat is None:
+        return jsonify(erreur="Paramètre annee manquant ou invalide"), 400
+    return jsonify(resultat)
@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, jsonify, url_for, current_app, Response, stream_with_context, abort
 from app.services.DonneeService import DonneeService
+from app.services.ExportService import FORMATS
+from app.services.SyncJobRunner import sync_runner
 from app.DonneeDAO import DonneeDAO
+import sqlite3
 
 synchro_bp = Blueprint('synchro', __name__)
 
@@ -9,7 +12,7 @@ synchro_bp = Blueprint('synchro', __name__)
 def setup():
     """Route utilitaire pour créer la DB et importer les données"""
 
-    return render_template('setup.html')
+    return _render_setup()
 
 # Initialisation de la base de données
 @synchro_bp.route('/setup/init', methods=['POST'])
@@ -18,6 +21,10 @@ def initialisation():
     dao = DonneeDAO()
     service = DonneeService()
 
+    # On ne supprime pas les tables sous les pieds d'une synchronisation
+    if sync_runner.is_running():
+        return _render_setup(msg_db="Synchronisation en cours, réessayez plus tard.")
+
     # Création des tables apparemment fonctionne
     try:
         dao.init_db()
@@ -25,24 +32,65 @@ def initialisation():
     except Exception as e:
         msg_db = f"Erreur DB: {e}"
 
-    return render_template("setup.html", msg_db=msg_db)
+    return _render_setup(msg_db=msg_db)
 
 # Synchronisation de la base de données avec les JSON
 @synchro_bp.route('/setup/sync', methods=['POST'])
 def synchronisation():
-    """Lance la synchronisation avec les données JSON"""
-    dao = DonneeDAO()
-    service = DonneeService()
+    """Met en file une synchronisation avec les données JSON et rend la main aussitôt"""
+    return _lancer_job('synchro', "Synchronisation lancée.")
+
+# Reconstruction complète en chargement en masse
+@synchro_bp.route('/setup/rebuild', methods=['POST'])
+def reconstruction():
+    """Reconstruit la base (init + synchro) dans une base temporaire, puis la bascule"""
+    return _lancer_job('reconstruction', "Reconstruction lancée.")
+
+def _lancer_job(mode, msg_lance):
+    job_id, cree = sync_runner.start(current_app._get_current_object(), mode)
 
-    #stats d'import mais ne fonctionnent pas correctement car même les INSERT IGNORÉS sont compté comme des insertions finales
-    stats = None
+    if cree:
+        msg_import = msg_lance
+    else:
+        msg_import = "Une synchronisation est déjà en cours."
 
-    # Import des données JSON
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job_id=job_id, cree=cree, message=msg_import,
+                       url=url_for('synchro.progression', job_id=job_id)), 202
+
+    return _render_setup(msg_import=msg_import, job_id=job_id)
+
+def _render_setup(**contexte):
+    """Page d'administration, avec le rapport des rejets de la dernière synchronisation"""
     try:
-        stats = service.run_import_pipeline()
-        msg_import = "Données importées depuis les JSON."
-    except Exception as e:
-        msg_import = f"Erreur Import: {e}"
-    
-    return render_template('setup.html', msg_import=msg_import, stats=stats)
+        rejets = DonneeService().get_rejets_summary()
+    except sqlite3.OperationalError:
+        # Base absente ou antérieure à la table rejet : rien à afficher
+        rejets = None
+    return render_template('setup.html', rejets=rejets, **contexte)
+
+# Export des enregistrements écartés à l'import
+@synchro_bp.route('/setup/rejets.<fmt>', methods=['GET'])
+def export_rejets(fmt):
+    """Un enregistrement écarté par ligne : fichier, motif, etudid, année, détail, fichier retenu"""
+    if fmt not in FORMATS:
+        abort(404)
+    mimetype, extension = FORMATS[fmt]
+    contenu = DonneeService().export_rejets(fmt)
+    return Response(stream_with_context(contenu), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="rejets.{extension}"'})
+
+# Avancement d'une synchronisation
+@synchro_bp.route('/setup/sync/<job_id>', methods=['GET'])
+def progression(job_id):
+    """Retourne l'état du job au format JSON"""
+    job = sync_runner.get(job_id)
+    if job is None:
+        return jsonify(erreur="Job inconnu"), 404
+    return jsonify(job)
 
+# Compteurs du cache applicatif
+@synchro_bp.route('/setup/cache', methods=['GET'])
+def cache_stats():
+    """Succès / échecs / évictions du cache des menus et recherches"""
+    return jsonify(DonneeService().get_cache_stats())
@@ -10,6 +10,10 @@ DROP TABLE IF EXISTS departement;
 DROP TABLE IF EXISTS rythme;
 DROP TABLE IF EXISTS etat;
 DROP TABLE IF EXISTS decision;
+DROP TABLE IF EXISTS fichier_source;
+DROP TABLE IF EXISTS stat_cohorte;
+DROP TABLE IF EXISTS trajectoire;
+DROP TABLE IF EXISTS rejet;
 
 PRAGMA foreign_keys = ON;
 
@@ -52,12 +56,16 @@ CREATE TABLE IF NOT EXISTS formation(
     UNIQUE(annee_but, id_departement, id_rythme)
 );
 
+-- Filtre département / rythme de la recherche de cohorte
+CREATE INDEX IF NOT EXISTS idx_formation_dept_rythme ON formation(id_departement, id_rythme, annee_but);
+
 CREATE TABLE IF NOT EXISTS parcours(
     id_parcours INTEGER PRIMARY KEY AUTOINCREMENT,
     code VARCHAR(10) NOT NULL,
     nom VARCHAR(255) NOT NULL,
     id_departement INT NOT NULL,
-    FOREIGN KEY(id_departement ) REFERENCES departement(id_departement )
+    FOREIGN KEY(id_departement ) REFERENCES departement(id_departement ),
+    UNIQUE(code, id_departement)
 );
 
 CREATE TABLE IF NOT EXISTS competence(
@@ -65,7 +73,18 @@ CREATE TABLE IF NOT EXISTS competence(
     nom VARCHAR(255) NOT NULL,
     acronyme VARCHAR(10) NOT NULL,
     id_parcours  INT NOT NULL,
-    FOREIGN KEY(id_parcours) REFERENCES parcours(id_parcours)
+    FOREIGN KEY(id_parcours) REFERENCES parcours(id_parcours),
+    UNIQUE(id_parcours, nom)
+);
+
+-- Manifeste des fichiers JSON importés (synchronisation incrémentale)
+CREATE TABLE IF NOT EXISTS fichier_source(
+    id_fichier INTEGER PRIMARY KEY AUTOINCREMENT,
+    chemin TEXT NOT NULL UNIQUE,
+    taille INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    hash TEXT NOT NULL,
+    nb_inscriptions INTEGER NOT NULL DEFAULT 0
 );
 
 CREATE TABLE IF NOT EXISTS inscription(
@@ -75,13 +94,19 @@ CREATE TABLE IF NOT EXISTS inscription(
     id_etat INTEGER NOT NULL,
     id_formation INTEGER NOT NULL,
     id_decision INTEGER,
+    id_fichier INTEGER,
     FOREIGN KEY(id_decision) REFERENCES decision(id_decision),
     FOREIGN KEY(id_etudiant) REFERENCES etudiant(id_etudiant),
     FOREIGN KEY(id_etat) REFERENCES etat(id_etat),
     FOREIGN KEY(id_formation) REFERENCES formation(id_formation),
+    FOREIGN KEY(id_fichier) REFERENCES fichier_source(id_fichier),
     UNIQUE(id_etudiant, annee_universitaire)
 );
 
+CREATE INDEX IF NOT EXISTS idx_inscription_fichier ON inscription(id_fichier);
+-- Index couvrant de la recherche de cohorte : (formation, année) -> étudiant, décision
+CREATE INDEX IF NOT EXISTS idx_inscription_formation_annee ON inscription(id_formation, annee_universitaire, id_etudiant, id_decision);
+
 CREATE TABLE IF NOT EXISTS evaluer(
     id_inscription INTEGER,
     id_competence INTEGER,
@@ -91,4 +116,52 @@ CREATE TABLE IF NOT EXISTS evaluer(
     FOREIGN KEY(id_inscription) REFERENCES inscription(id_inscription),
     FOREIGN KEY(id_competence) REFERENCES competence(id_competence),
     FOREIGN KEY(id_decision) REFERENCES decision(id_decision)
-);
\ No newline at end of file
+);
+
+-- Agrégats de suivi de cohorte, recalculés en fin de synchronisation
+-- annee_debut = année universitaire d'entrée en BUT 1 de la cohorte
+CREATE TABLE IF NOT EXISTS stat_cohorte(
+    annee_debut INTEGER NOT NULL,
+    dept TEXT NOT NULL,
+    rythme TEXT NOT NULL,
+    annee_but INTEGER NOT NULL,
+    decision TEXT NOT NULL,
+    nb INTEGER NOT NULL,
+    PRIMARY KEY(annee_debut, dept, rythme, annee_but, decision)
+) WITHOUT ROWID;
+
+-- Parcours de chaque étudiant sur toutes ses années, encodé à la synchronisation
+-- chemin = "BUT1-FI:ADM → BUT2-FA:ADM → BUT3-FA:ADM"
+CREATE TABLE IF NOT EXISTS trajectoire(
+    id_etudiant INTEGER PRIMARY KEY,
+    annee_debut INTEGER NOT NULL,
+    dept TEXT NOT NULL,
+    rythme TEXT NOT NULL,
+    nb_etapes INTEGER NOT NULL,
+    chemin TEXT NOT NULL,
+    FOREIGN KEY(id_etudiant) REFERENCES etudiant(id_etudiant)
+);
+
+CREATE INDEX IF NOT EXISTS idx_trajectoire_cohorte ON trajectoire(annee_debut, dept, rythme, chemin);
+
+-- Enregistrements écartés à l'import, avec leur motif (voir MOTIFS_REJET de ImportEngine)
+-- etudid vaut NULL pour un enregistrement sans identifiant ou un fichier illisible
+-- Inscription écartée au profit d'une autre (doublon, conflit) : année, inscription retenue
+-- et valeurs de l'enregistrement écarté (état, formation, décision)
+CREATE TABLE IF NOT EXISTS rejet(
+    id_rejet INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_fichier INTEGER,
+    motif TEXT NOT NULL,
+    etudid TEXT,
+    annee_universitaire INTEGER,
+    detail TEXT,
+    id_inscription INTEGER,
+    id_etat INTEGER,
+    id_formation INTEGER,
+    id_decision INTEGER,
+    FOREIGN KEY(id_fichier) REFERENCES fichier_source(id_fichier),
+    FOREIGN KEY(id_inscription) REFERENCES inscription(id_inscription)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rejet_fichier ON rejet(id_fichier);
+CREATE INDEX IF NOT EXISTS idx_rejet_inscription ON rejet(id_inscription);
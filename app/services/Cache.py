@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+
+class GenerationCache:
+    """
+    Cache en mémoire du processus, invalidé par la génération des données.
+    Toute valeur est associée à la génération lue en base (PRAGMA user_version) ;
+    dès qu'une synchronisation ou une initialisation l'incrémente, le cache
+    entier est vidé.
+    Les valeurs "fixes" (menus, état de la base) sont gardées sans limite,
+    les recherches passent par une LRU de taille bornée.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._generation = None
+        self._fixes = {}
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, generation, key, compute, lru=False):
+        """Retourne la valeur en cache pour key, sinon la calcule avec compute()"""
+        with self._lock:
+            self._check_generation(generation)
+            store = self._lru if lru else self._fixes
+            if key in store:
+                self.hits += 1
+                if lru:
+                    self._lru.move_to_end(key)
+                return store[key]
+            self.misses += 1
+
+        # Calcul hors verrou : deux requêtes simultanées peuvent calculer la même valeur
+        value = compute()
+
+        with self._lock:
+            if self._generation == generation:
+                if lru:
+                    self._lru[key] = value
+                    while len(self._lru) > self.max_entries:
+                        self._lru.popitem(last=False)
+                        self.evictions += 1
+                else:
+                    self._fixes[key] = value
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "generation": self._generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "entrees_fixes": len(self._fixes),
+                "entrees_recherches": len(self._lru),
+                "max_recherches": self.max_entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._generation = None
+            self._fixes.clear()
+            self._lru.clear()
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            self._fixes.clear()
+            self._lru.clear()
+            self._generation = generation
+
+
+# Instance partagée par le processus
+cache = GenerationCache()
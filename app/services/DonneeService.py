@@ -1,55 +1,283 @@
 import os
 import json
+import time
+import tempfile
 import glob
+import base64
+import hashlib
+import itertools
 import re
+import unicodedata
+import sqlite3
+from contextlib import contextmanager
 from app.DonneeDAO import DonneeDAO
-from app.Etudiant import EtudiantView
+from app.Etudiant import EtudiantView, PageEtudiants, FicheEtudiant, InscriptionView
+from app.StatCohorte import StatCohorteView
+from app.services.ImportEngine import ImportEngine, MODALITES_RYTHME, MOTIFS_REJET, file_priority
+from app.services.Cache import cache
+from app.services.ExportService import ExportService, TAILLE_LOT
+from app.Metrics import metrics
 from flask import current_app
 
+COLONNES_EXPORT_ETUDIANTS = ['ine', 'annee_universitaire', 'annee_but', 'resultat', 'dept', 'rythme']
+COLONNES_EXPORT_COHORTES = ['annee_debut', 'dept', 'rythme', 'annee_but', 'decision', 'nb']
+COLONNES_EXPORT_REJETS = ['fichier', 'motif', 'etudid', 'annee_universitaire', 'detail', 'fichier_retenu']
+
+# Nombre maximal de fiches retournées par une recherche d'étudiant
+MAX_FICHES = 20
+# Début d'INE (chiffres et lettres) ou d'etudid (hexadécimal)
+FORMAT_IDENTIFIANT = re.compile(r'[0-9A-Za-z]{1,64}')
+# Nombre de lignes (fichier, motif) du rapport de rejets de la page d'administration
+MAX_FICHIERS_REJETS = 20
+
 class DonneeService:
     def __init__(self):
         self.dao = DonneeDAO()
+        self._generation = None
+
+    def get_generation(self):
+        """Génération des données, lue une fois par instance (donc par requête)"""
+        if self._generation is None:
+            self._generation = self.dao.get_generation()
+        return self._generation
 
     def is_database_ready(self):
-        """Demande au DAO si les données sont cohérentes"""
-        return self.dao.check_data_integrity()
+        """Demande au DAO si les données sont cohérentes (résultat mis en cache)"""
+        try:
+            generation = self.get_generation()
+        except sqlite3.OperationalError:
+            # Fichier de base absent ou illisible
+            return False
+        return cache.get_or_compute(generation, 'ready', self.dao.check_data_integrity)
 
     def get_form_dept(self):
         """Retourne les options de département pour le formulaire"""
-        return self.dao.get_all_departements()
+        return cache.get_or_compute(self.get_generation(), 'depts', self.dao.get_all_departements)
 
     def get_form_annees(self):
         """Retourne les options d'années pour le formulaire"""
-        return self.dao.get_all_annees()    
+        return cache.get_or_compute(self.get_generation(), 'annees', self.dao.get_all_annees)
+
+    def warm_up(self):
+        """
+        Préchauffe le cache du processus (état de la base, menus), partagé par
+        tous ses threads. Appelé une fois par worker au démarrage.
+        """
+        if self.is_database_ready():
+            self.get_form_dept()
+            self.get_form_annees()
+            self.get_stat_annees()
+
+    def get_cache_stats(self):
+        """Compteurs du cache (succès / échecs / évictions)"""
+        return cache.stats()
 
-    def get_search_results(self, year, dept, rythme):
-        """Retourne les objets EtudiantView après recherche"""
+    def get_search_page(self, year, dept, rythme, apres=None, avant=None):
+        """
+        Retourne une PageEtudiants (pagination par clé sur l'INE).
+        apres / avant sont les curseurs opaques reçus de la page précédente.
+        Les pages récentes sont servies par le cache LRU.
+        """
         if not year:
-            return []
-        
+            return None
+        cle = ('page', year, dept, rythme, apres, avant, current_app.config['PAGE_SIZE'])
+        return cache.get_or_compute(self.get_generation(), cle,
+                                    lambda: self._compute_search_page(year, dept, rythme, apres, avant), lru=True)
+
+    def _compute_search_page(self, year, dept, rythme, apres, avant):
         try:
             annee_int = int(year)
-            rows = self.dao.search_etudiants(annee_int, dept, rythme)
-            # Transformation des lignes SQL en objets métier
-            return [
-                EtudiantView(
-                    ine=row['ine'], 
-                    annee_univ=row['annee_universitaire'], 
-                    annee_but=row['annee_but'], 
-                    resultat=row['resultat'], 
-                    dept=row['dept'], 
-                    rythme=row['rythme']
-                ) for row in rows
-            ]
         except ValueError:
-            return []
+            return None
+
+        taille = current_app.config['PAGE_SIZE']
+        cle_apres = self._decode_cursor(apres)
+        cle_avant = self._decode_cursor(avant) if cle_apres is None else None
+
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        rows = self.dao.search_etudiants(annee_int, dept, rythme, taille + 1, cle_apres, cle_avant)
+        encore = len(rows) > taille
+        rows = rows[:taille]
+
+        if cle_avant is not None:
+            rows = rows[::-1]
+            a_precedent, a_suivant = encore, True
+        else:
+            a_precedent, a_suivant = cle_apres is not None, encore
+
+        results = [self._to_view(row) for row in rows]
+        suivant = precedent = None
+        if rows and a_suivant:
+            suivant = self._encode_cursor(rows[-1])
+        if rows and a_precedent:
+            precedent = self._encode_cursor(rows[0])
+
+        total = self.dao.count_etudiants(annee_int, dept, rythme)
+        return PageEtudiants(results, total, suivant, precedent)
+
+    def find_etudiants(self, prefixe):
+        """
+        Recherche d'étudiants par début d'INE / etudid.
+        Retourne (fiches, tronque) : au plus MAX_FICHES FicheEtudiant,
+        tronque vaut True s'il existe d'autres correspondances.
+        Un préfixe hors de l'alphabet des identifiants ne correspond à personne.
+        """
+        prefixe = (prefixe or "").strip()
+        if not self.prefixe_valide(prefixe):
+            return [], False
+
+        rows = self.dao.find_etudiants(prefixe, MAX_FICHES + 1)
+        fiches = []
+        for ine, lignes in itertools.groupby(rows, key=lambda r: r['ine']):
+            lignes = list(lignes)
+            fiche = FicheEtudiant(ine, lignes[0]['chemin'])
+            for _, par_annee in itertools.groupby(lignes, key=lambda r: r['id_inscription']):
+                par_annee = list(par_annee)
+                r = par_annee[0]
+                if r['id_inscription'] is None:
+                    # Étudiant connu sans inscription exploitable
+                    continue
+                inscription = InscriptionView(r['annee_universitaire'], r['annee_but'], r['dept'],
+                                              r['rythme'], r['etat'], r['resultat'] or "Inconnu")
+                inscription.competences = [
+                    {"nom": c['competence'], "acronyme": c['competence_acronyme'],
+                     "resultat": c['competence_resultat'], "moyenne": c['moyenne']}
+                    for c in par_annee if c['competence'] is not None
+                ]
+                fiche.inscriptions.append(inscription)
+            fiches.append(fiche)
+
+        return fiches[:MAX_FICHES], len(fiches) > MAX_FICHES
+
+    @staticmethod
+    def prefixe_valide(prefixe):
+        """Le préfixe peut-il être le début d'un INE / etudid ?"""
+        return FORMAT_IDENTIFIANT.fullmatch(prefixe) is not None
+
+    def export_search(self, fmt, year, dept, rythme):
+        """
+        Export en flux des résultats de recherche (csv, ndjson, colonnes).
+        Retourne un générateur de texte ; rien n'est construit en mémoire.
+        """
+        annee_int = int(year)
+        lots = self.dao.iter_search_etudiants(annee_int, dept, rythme, TAILLE_LOT)
+        return ExportService().stream(fmt, COLONNES_EXPORT_ETUDIANTS, lots)
+
+    def export_cohort_stats(self, fmt, year, dept, rythme):
+        """Export en flux des agrégats de cohorte (table stat_cohorte), lus par lots"""
+        annee_int = int(year) if year and year != "TOUS" else None
+        lots = self.dao.iter_cohort_stats(annee_int, dept, rythme, TAILLE_LOT)
+        return ExportService().stream(fmt, COLONNES_EXPORT_COHORTES, lots)
 
-    def run_import_pipeline(self):
+    def get_rejets_summary(self):
+        """
+        Rapport des enregistrements écartés à l'import, pour la page d'administration :
+        comptes par motif (avec libellé) et fichiers les plus concernés.
+        """
+        def calcul():
+            par_motif = [dict(r, libelle=MOTIFS_REJET.get(r['motif'], r['motif']))
+                         for r in self.dao.get_rejets_par_motif()]
+            return {
+                "total": sum(r['nb'] for r in par_motif),
+                "par_motif": par_motif,
+                "par_fichier": [dict(r) for r in self.dao.get_rejets_par_fichier(MAX_FICHIERS_REJETS)],
+            }
+        return cache.get_or_compute(self.get_generation(), 'rejets', calcul)
+
+    def export_rejets(self, fmt):
+        """Export en flux de tous les rejets (un enregistrement écarté par ligne)"""
+        return ExportService().stream(fmt, COLONNES_EXPORT_REJETS, self.dao.iter_rejets(TAILLE_LOT))
+
+    def get_cohort_stats(self, year, dept, rythme):
+        """Retourne les StatCohorteView lues dans les agrégats précalculés"""
+        annee_int = None
+        if year and year != "TOUS":
+            try:
+                annee_int = int(year)
+            except ValueError:
+                return []
+
+        lignes = {}
+        for row in self.dao.get_cohort_stats(annee_int, dept, rythme):
+            cle = (row['annee_debut'], row['dept'], row['rythme'], row['annee_but'])
+            if cle not in lignes:
+                lignes[cle] = StatCohorteView(*cle)
+            lignes[cle].ajouter(row['decision'], row['nb'])
+        return list(lignes.values())
+
+    def get_cohort_flows(self, year, dept, rythme):
+        """
+        Agrège les trajectoires d'une cohorte sous forme de flux (Sankey) :
+        chemins complets, noeuds "étape k" et liens entre étapes successives.
+        """
+        try:
+            annee_int = int(year)
+        except (TypeError, ValueError):
+            return None
+
+        chemins = []
+        liens = {}
+        noeuds = {}
+        for row in self.dao.get_trajectoires(annee_int, dept, rythme):
+            nb = row['nb']
+            etapes = row['chemin'].split(" → ")
+            chemins.append({"chemin": row['chemin'], "nb": nb})
+
+            # Le rang de l'étape fait partie du noeud pour éviter les cycles
+            ids = [f"{k + 1}:{etape}" for k, etape in enumerate(etapes)]
+            for noeud in ids:
+                noeuds[noeud] = noeuds.get(noeud, 0) + nb
+            for source, cible in zip(ids, ids[1:]):
+                liens[(source, cible)] = liens.get((source, cible), 0) + nb
+
+        chemins.sort(key=lambda c: -c["nb"])
+        return {
+            "cohorte": annee_int,
+            "dept": dept,
+            "rythme": rythme,
+            "effectif": sum(c["nb"] for c in chemins),
+            "chemins": chemins,
+            "noeuds": [{"id": n, "nb": nb} for n, nb in noeuds.items()],
+            "liens": [{"source": s, "cible": c, "nb": nb} for (s, c), nb in liens.items()],
+        }
+
+    def get_stat_annees(self):
+        """Retourne les années de cohorte disponibles pour le formulaire des statistiques"""
+        return cache.get_or_compute(self.get_generation(), 'stat_annees', self.dao.get_stat_annees)
+
+    def _to_view(self, row):
+        return EtudiantView(
+            ine=row['ine'],
+            annee_univ=row['annee_universitaire'],
+            annee_but=row['annee_but'],
+            resultat=row['resultat'],
+            dept=row['dept'],
+            rythme=row['rythme']
+        )
+
+    def _encode_cursor(self, row):
+        """Curseur opaque = clé (ine, annee_universitaire) encodée en base64"""
+        cle = json.dumps([row['ine'], row['annee_universitaire']])
+        return base64.urlsafe_b64encode(cle.encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, curseur):
+        """Retourne la clé (ine, annee) ou None si le curseur est absent ou invalide"""
+        if not curseur:
+            return None
+        try:
+            ine, annee = json.loads(base64.urlsafe_b64decode(curseur.encode('ascii')))
+            return (str(ine), int(annee))
+        except (ValueError, TypeError):
+            return None
+
+    def run_import_pipeline(self, progress=None, db=None):
         """
         Logique massive d'importation (ancien import_data.py)
-        pour utiliser le DAO
+        pour utiliser le DAO.
+        progress est transmis au moteur d'import pour le suivi d'avancement.
+        db : connexion cible (par défaut la base de l'application).
         """
-        db = self.dao.get_db()
+        db = db or self.dao.get_db()
         cursor = db.cursor()
         
         #CETTE PARTIE LÀ SERA PROBABKEMENT À MODIFIER POUR Y AJOUTER UNE FONCTION QUI LANCE UNE CONNECTION À L'API SCODOC ET RÉCUPÈRE LES DONNÉES
@@ -66,36 +294,132 @@ class DonneeService:
             print("Fichiers de configuration manquants.")
             return
 
-        # Fonctions internes d'import 
-        self._import_decisions(cursor)
-        self._import_departements(cursor, depts_json)
-        self._import_rythmes(cursor)
-        self._import_etats(cursor)
-        self._import_etudiants(cursor, json_dir)
-        self._import_formations(cursor)
-        self._import_inscriptions(cursor, json_dir)
+        # Verrou d'écriture pris dès le début : une autre synchro (autre processus) attend ou échoue
+        db.execute("BEGIN IMMEDIATE")
+        metrics.reset_etapes()
+
+        # Index des formsemestres (fs_<id> -> département, année, niveau, rythme)
+        with self._etape("formsemestres", db) as etape:
+            formsemestres, etape["fichiers"] = self._load_formsemestres(json_dir)
+            etape["lignes"] = len(formsemestres)
+
+        # Fonctions internes d'import (tables de référence)
+        # Les départements sont réécrits à chaque synchro : comparés avant / après
+        departements = cursor.execute("SELECT * FROM departement ORDER BY id_departement").fetchall()
+        with self._etape("decisions", db) as e_decisions:
+            self._import_decisions(cursor)
+        with self._etape("departements", db):
+            self._import_departements(cursor, depts_json)
+        with self._etape("rythmes", db):
+            self._import_rythmes(cursor)
+        with self._etape("etats", db):
+            self._import_etats(cursor)
+        with self._etape("formations", db) as e_formations:
+            self._import_formations(cursor, formsemestres)
+        references_modifiees = (e_decisions["lignes"] + e_formations["lignes"] > 0 or departements !=
+                                cursor.execute("SELECT * FROM departement ORDER BY id_departement").fetchall())
+
+        # Manifeste : seuls les fichiers nouveaux ou modifiés sont relus
+        # Liste triée : identifiants du manifeste attribués dans le même ordre à chaque import
+        files = sorted(glob.glob(os.path.join(json_dir, "decisions_*.json")))
+        with self._etape("manifeste", db) as etape:
+            a_importer, relectures, cles, bilan, ids_fichiers = self._sync_manifest(cursor, json_dir, files)
+            etape["fichiers"] = len(files)
+
+        # Rang de chaque fichier présent : départage les inscriptions d'un même étudiant sur une même année.
+        # Les fichiers sont lus du plus prioritaire au moins prioritaire (peu de remplacements).
+        ordre = sorted(files, key=lambda p: file_priority(os.path.basename(p), formsemestres))
+        fichiers = {ids_fichiers[p]: (rang, os.path.relpath(p, json_dir)) for rang, p in enumerate(ordre)}
+        a_importer.sort(key=lambda f: fichiers[f[1]][0], reverse=True)
+
+        # Référentiels de compétences : chargés une fois, seulement s'il y a des fichiers à lire
+        with self._etape("referentiels", db):
+            referentiels = self._import_referentiels(cursor, json_dir, formsemestres) if a_importer or relectures else None
+
+        # Étudiants, inscriptions et moyennes de compétences : une seule lecture en flux de chaque fichier
+        with self._etape("etudiants_inscriptions", db) as etape:
+            engine = ImportEngine(cursor, current_app.config['IMPORT_BATCH_SIZE'], referentiels, fichiers)
+            stats = engine.run(a_importer, current_app.config['IMPORT_WORKERS'], progress, relectures, cles)
+            # Un remplacement ou une restauration change aussi le compte des autres fichiers
+            modifie = a_importer or relectures or bilan["fichiers_supprimes"]
+            self._update_manifest_counts(cursor, list(fichiers) if modifie else [])
+            etape["fichiers"] = len(a_importer) + len(relectures)
+            etape["lignes"] = stats["nouveaux"] + stats["inscriptions"] + stats["evaluations"]
+        stats.update(bilan)
+
+        # Dernières étapes : agrégats et parcours (inutiles si aucune inscription n'a bougé)
+        if a_importer or bilan["fichiers_supprimes"]:
+            with self._etape("stat_cohorte", db):
+                self._refresh_cohort_stats(cursor)
+            with self._etape("trajectoires", db):
+                self._refresh_trajectories(cursor)
+
+        # Tout est validé en une seule transaction
+        # Nouvelle génération seulement si les données ont changé : les caches de tous
+        # les processus sont alors invalidés, sinon ils restent valides
+        with self._etape("commit", db):
+            if a_importer or bilan["fichiers_supprimes"] or references_modifiees:
+                self.dao.bump_generation(cursor)
+            db.commit()
+        stats["etapes"] = metrics.etapes()
+        print(f"Import terminé en {stats['duree']} s (pic mémoire : {stats['rss_pic_mo']} Mo).")
 
-        total_etu, nouveaux_etu = self._import_etudiants(cursor, json_dir)
-        
-        self._import_formations(cursor)
-        nb_inscriptions = self._import_inscriptions(cursor, json_dir)
+        # On retourne un dictionnaire de résultats
+        return stats
 
-        db.commit()
-        print("Import terminé avec succès.")  #retirer les print on s'en sert pas nan ?
+    def rebuild_database(self, progress=None):
+        """
+        Reconstruction complète (équivalent de init + synchro) en chargement en masse :
+        import dans une base temporaire sans index secondaires ni contrôle des clés
+        étrangères, création des index en une passe, vérification des clés, puis
+        bascule du contenu dans la base de l'application en une transaction.
+        Les lecteurs continuent de lire l'ancienne base jusqu'à la bascule.
+        """
+        debut = time.perf_counter()
+        dossier = os.path.dirname(os.path.abspath(current_app.config['DATABASE']))
+        fd, chemin = tempfile.mkstemp(prefix='reconstruction_', suffix='.db', dir=dossier)
+        os.close(fd)
 
-        # On calcule ceux déjà présents
-        deja_connus = total_etu - nouveaux_etu
+        try:
+            staging, index = self.dao.open_staging_db(chemin)
+            try:
+                stats = self.run_import_pipeline(progress, db=staging)
+                if stats is None:
+                    return None
+
+                with self._etape("index", staging):
+                    self.dao.build_indexes(staging, index)
+                with self._etape("cles_etrangeres", staging) as etape:
+                    etape["lignes"] = violations = self.dao.foreign_key_violations(staging)
+                if violations:
+                    raise RuntimeError(f"{violations} ligne(s) violent les clés étrangères, base non remplacée")
+                with self._etape("bascule", staging):
+                    self.dao.swap_in(staging)
+            finally:
+                staging.close()
+        finally:
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
 
-        # On retourne un dictionnaire de résultats
-        return {
-            "total_distincts": total_etu,
-            "nouveaux": nouveaux_etu,
-            "connus": deja_connus,
-            "inscriptions": nb_inscriptions
-        }
+        stats["etapes"] = metrics.etapes()
+        stats["mode"] = "reconstruction"
+        stats["duree_totale"] = round(time.perf_counter() - debut, 2)
+        print(f"Reconstruction terminée en {stats['duree_totale']} s.")
+        return stats
 
     # Méthodes privées d'import
 
+    @contextmanager
+    def _etape(self, nom, db):
+        """Chronomètre une étape de la synchro ; par défaut, lignes = modifications en base"""
+        avant = db.total_changes
+        with metrics.etape(nom) as mesure:
+            yield mesure
+            if not mesure["lignes"]:
+                mesure["lignes"] = db.total_changes - avant
+
     def _import_decisions(self, cursor):
         codes = [
             ("Admis", "ADM"), ("Ajourné", "AJ"), ("Admis par Compensation", "CMP"),
@@ -127,27 +451,246 @@ class DonneeService:
         cursor.execute("INSERT OR REPLACE INTO etat (id_etat, nom, acronyme) VALUES (1, 'Inscrit', 'I')")
         cursor.execute("INSERT OR REPLACE INTO etat (id_etat, nom, acronyme) VALUES (2, 'Démission', 'D')")
 
-# séparer l'import manuel des décisions etc. qui ne vont pas changer avec 
-# l'import des étudiants/formations/inscriptions qui se synchronysent
-    def _import_etudiants(self, cursor, dossier_json):
-        files = glob.glob(os.path.join(dossier_json, "decisions_*.json"))
-        ines = set()
+    def _sync_manifest(self, cursor, json_dir, files):
+        """
+        Compare les fichiers présents au manifeste fichier_source.
+        Purge les inscriptions des fichiers modifiés ou supprimés et retourne :
+          - la liste [(chemin, id_fichier)] à (ré)importer ;
+          - les fichiers inchangés à relire en partie [(chemin, id_fichier)] et les
+            clés (etudid, année) concernées : leurs inscriptions écartées au profit
+            d'une inscription purgée redeviennent candidates, comme dans un import complet ;
+          - le bilan et l'identifiant de chaque fichier présent {chemin: id_fichier}.
+        """
+        cursor.execute("SELECT chemin, id_fichier, taille, mtime, hash FROM fichier_source")
+        manifeste = {r[0]: r[1:] for r in cursor.fetchall()}
+
+        a_importer = []
+        ids = {}
+        a_restaurer = {}
+        bilan = {"fichiers_ignores": 0, "fichiers_nouveaux": 0,
+                 "fichiers_reimportes": 0, "fichiers_supprimes": 0,
+                 "fichiers_relus": 0, "inscriptions_supprimees": 0}
+        db = cursor.connection
+
         for f_path in files:
-            try:
-                with open(f_path, 'r', encoding='utf-8') as f:
-                    content = json.load(f)
-                    for rec in content:
-                        ine = rec.get('etudid')
-                        if ine: ines.add(ine)
-            except Exception: pass
-        cursor.executemany("INSERT OR IGNORE INTO etudiant (ine) VALUES (?)", [(ine,) for ine in ines])
-
-        nb_ajoutes = cursor.rowcount
-        nb_total = len(ines)
-        
-        return nb_total, nb_ajoutes
+            chemin = os.path.relpath(f_path, json_dir)
+            st = os.stat(f_path)
+            connu = manifeste.pop(chemin, None)
+
+            if connu is None:
+                cursor.execute("INSERT INTO fichier_source (chemin, taille, mtime, hash) VALUES (?, ?, ?, ?)",
+                               (chemin, st.st_size, st.st_mtime, self._hash_file(f_path)))
+                ids[f_path] = cursor.lastrowid
+                a_importer.append((f_path, cursor.lastrowid))
+                bilan["fichiers_nouveaux"] += 1
+                continue
+
+            id_fichier, taille, mtime, ancien_hash = connu
+            ids[f_path] = id_fichier
+            # Taille et date identiques : le fichier n'est même pas relu
+            if taille == st.st_size and mtime == st.st_mtime:
+                bilan["fichiers_ignores"] += 1
+                continue
+
+            nouveau_hash = self._hash_file(f_path)
+            cursor.execute("UPDATE fichier_source SET taille = ?, mtime = ?, hash = ? WHERE id_fichier = ?",
+                           (st.st_size, st.st_mtime, nouveau_hash, id_fichier))
+            if nouveau_hash == ancien_hash:
+                # Simple "touch" : contenu inchangé
+                bilan["fichiers_ignores"] += 1
+                continue
+
+            bilan["inscriptions_supprimees"] += self._delete_file_rows(cursor, id_fichier, a_restaurer)
+            a_importer.append((f_path, id_fichier))
+            bilan["fichiers_reimportes"] += 1
+
+        # Ce qui reste dans le manifeste a disparu du dossier
+        for chemin, (id_fichier, _, _, _) in manifeste.items():
+            bilan["inscriptions_supprimees"] += self._delete_file_rows(cursor, id_fichier, a_restaurer)
+            cursor.execute("DELETE FROM fichier_source WHERE id_fichier = ?", (id_fichier,))
+            bilan["fichiers_supprimes"] += 1
+
+        # Les fichiers réimportés sont relus en entier ; les fichiers supprimés n'ont plus de chemin
+        chemins = {id_fichier: f_path for f_path, id_fichier in ids.items()}
+        reimportes = {id_fichier for _, id_fichier in a_importer}
+        relectures = [(chemins[i], i) for i in sorted(a_restaurer) if i in chemins and i not in reimportes]
+        cles = set()
+        for _, id_fichier in relectures:
+            cles |= a_restaurer[id_fichier]
+        bilan["fichiers_relus"] = len(relectures)
+
+        return a_importer, relectures, cles, bilan, ids
+
+    def _delete_file_rows(self, cursor, id_fichier, a_restaurer):
+        """
+        Supprime les inscriptions (et leurs évaluations) issues d'un fichier, ainsi que ses rejets.
+        Les inscriptions d'autres fichiers écartées au profit des inscriptions supprimées
+        sont notées dans a_restaurer {id_fichier: {(etudid, année)}} et leurs rejets retirés.
+        """
+        cursor.execute("""
+            SELECT r.id_fichier, r.etudid, r.annee_universitaire FROM rejet r
+            JOIN inscription i ON i.id_inscription = r.id_inscription
+            WHERE i.id_fichier = ?""", (id_fichier,))
+        for autre, etudid, annee in cursor.fetchall():
+            a_restaurer.setdefault(autre, set()).add((etudid, annee))
+        cursor.execute("""
+            DELETE FROM rejet WHERE id_inscription IN
+                (SELECT id_inscription FROM inscription WHERE id_fichier = ?)""", (id_fichier,))
+        cursor.execute("DELETE FROM rejet WHERE id_fichier = ?", (id_fichier,))
+        cursor.execute("""
+            DELETE FROM evaluer WHERE id_inscription IN
+                (SELECT id_inscription FROM inscription WHERE id_fichier = ?)""", (id_fichier,))
+        cursor.execute("DELETE FROM inscription WHERE id_fichier = ?", (id_fichier,))
+        return cursor.rowcount
 
-    def _import_formations(self, cursor):
+    def _update_manifest_counts(self, cursor, ids_fichiers):
+        """Enregistre le nombre d'inscriptions produites par chaque fichier importé"""
+        if not ids_fichiers:
+            return
+        # Un seul parcours de inscription (sans index sur id_fichier en reconstruction)
+        cursor.execute("SELECT id_fichier, COUNT(*) FROM inscription WHERE id_fichier IS NOT NULL GROUP BY id_fichier")
+        comptes = dict(cursor.fetchall())
+        cursor.executemany("UPDATE fichier_source SET nb_inscriptions = ? WHERE id_fichier = ?",
+                           [(comptes.get(i, 0), i) for i in ids_fichiers])
+
+    def _refresh_cohort_stats(self, cursor):
+        """Recalcule la table stat_cohorte en une seule agrégation"""
+        cursor.execute("DELETE FROM stat_cohorte")
+        cursor.execute("""
+            INSERT INTO stat_cohorte (annee_debut, dept, rythme, annee_but, decision, nb)
+            SELECT
+                i.annee_universitaire - (f.annee_but - 1),
+                d.acronyme,
+                r.acronyme,
+                f.annee_but,
+                COALESCE(dec.acronyme, 'INCONNU'),
+                COUNT(*)
+            FROM inscription i
+            JOIN formation f ON i.id_formation = f.id_formation
+            JOIN departement d ON f.id_departement = d.id_departement
+            JOIN rythme r ON f.id_rythme = r.id_rythme
+            LEFT JOIN decision dec ON i.id_decision = dec.id_decision
+            GROUP BY 1, 2, 3, 4, 5""")
+
+    def _refresh_trajectories(self, cursor):
+        """
+        Reconstruit la table trajectoire en un seul parcours de inscription
+        trié par (id_etudiant, annee_universitaire), ordre fourni par
+        l'index UNIQUE de la table : aucune auto-jointure.
+        """
+        cursor.execute("DELETE FROM trajectoire")
+        lecture = cursor.connection.cursor()
+        lecture.execute("""
+            SELECT
+                i.id_etudiant,
+                i.annee_universitaire,
+                f.annee_but,
+                d.acronyme,
+                r.acronyme,
+                COALESCE(dec.acronyme, 'INCONNU')
+            FROM inscription i
+            JOIN formation f ON i.id_formation = f.id_formation
+            JOIN departement d ON f.id_departement = d.id_departement
+            JOIN rythme r ON f.id_rythme = r.id_rythme
+            LEFT JOIN decision dec ON i.id_decision = dec.id_decision
+            ORDER BY i.id_etudiant, i.annee_universitaire""")
+
+        lot = []
+        for id_etudiant, etapes in itertools.groupby(lecture, key=lambda r: r[0]):
+            etapes = list(etapes)
+            _, annee, annee_but, dept, rythme, _ = etapes[0]
+            chemin = " → ".join(f"BUT{e[2]}-{e[4]}:{e[5]}" for e in etapes)
+            lot.append((id_etudiant, annee - (annee_but - 1), dept, rythme, len(etapes), chemin))
+            if len(lot) >= current_app.config['IMPORT_BATCH_SIZE']:
+                cursor.executemany("INSERT INTO trajectoire (id_etudiant, annee_debut, dept, rythme, nb_etapes, chemin) VALUES (?, ?, ?, ?, ?, ?)", lot)
+                lot = []
+        cursor.executemany("INSERT INTO trajectoire (id_etudiant, annee_debut, dept, rythme, nb_etapes, chemin) VALUES (?, ?, ?, ?, ?, ?)", lot)
+
+    def _hash_file(self, f_path):
+        h = hashlib.sha256()
+        with open(f_path, 'rb') as f:
+            for bloc in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloc)
+        return h.hexdigest()
+
+    def _load_formsemestres(self, json_dir):
+        """
+        Index des formsemestres ScoDoc, construit une fois par synchro :
+        id -> {formation, parcours, dept, annee, niveau, semestre, debut, modalite, titre}.
+        annee est l'année universitaire de début (semestre commencé avant août :
+        année précédente), niveau l'année de BUT déduite de semestre_id,
+        debut la date de début ISO (priorité des fichiers, voir file_priority).
+        Retourne (index, nombre de fichiers lus).
+        """
+        index = {}
+        fichiers = sorted(glob.glob(os.path.join(json_dir, "formsemestres_*.json")))
+        for f_path in fichiers:
+            with open(f_path, 'r', encoding='utf-8') as f:
+                for sem in json.load(f):
+                    annee = None
+                    try:
+                        _, mois, an = (int(x) for x in sem.get('date_debut', '').split('/'))
+                        annee = an if mois >= 8 else an - 1
+                    except ValueError:
+                        pass
+                    semestre = sem.get('semestre_id')
+                    index[sem['id']] = {
+                        'formation': sem.get('formation_id'),
+                        'parcours': tuple(p.get('code') for p in sem.get('parcours') or []),
+                        'dept': sem.get('dept_id'),
+                        'annee': annee,
+                        'niveau': (semestre + 1) // 2 if isinstance(semestre, int) and semestre > 0 else None,
+                        'semestre': semestre if isinstance(semestre, int) else None,
+                        'debut': sem.get('date_debut_iso'),
+                        'modalite': sem.get('modalite'),
+                        'titre': sem.get('titre'),
+                    }
+        return index, len(fichiers)
+
+    def _import_referentiels(self, cursor, json_dir, formsemestres):
+        """
+        Charge les référentiels de compétences, insère parcours et compétences,
+        et retourne la table de correspondance utilisée par le moteur d'import :
+          'fs'   : index des formsemestres (voir _load_formsemestres)
+          'comp' : (id formation ScoDoc, année BUT) -> [(code parcours, ids compétences, noms)]
+        Dans chaque année, les compétences sont triées par numéro (ordre des RCUE).
+        """
+        comp = {}
+        cache_parcours = {}
+        cache_comp = {}
+        for f_path in sorted(glob.glob(os.path.join(json_dir, "referentiel_competences_BUT_*.json"))):
+            id_formation = int(re.search(r'_(\d+)\.json$', f_path).group(1))
+            with open(f_path, 'r', encoding='utf-8') as f:
+                ref = json.load(f)
+            # Certains référentiels exportés sont vides
+            if not isinstance(ref, dict) or not ref.get('parcours'):
+                continue
+
+            id_dept = ref.get('dept_id')
+            numeros = {unicodedata.normalize('NFC', nom): c.get('numero', 0) for nom, c in ref['competences'].items()}
+
+            for code, parcours in sorted(ref['parcours'].items()):
+                if (code, id_dept) not in cache_parcours:
+                    cursor.execute("INSERT OR IGNORE INTO parcours (code, nom, id_departement) VALUES (?, ?, ?)", (code, parcours.get('libelle', code), id_dept))
+                    cursor.execute("SELECT id_parcours FROM parcours WHERE code = ? AND id_departement = ?", (code, id_dept))
+                    cache_parcours[(code, id_dept)] = cursor.fetchone()[0]
+                id_parcours = cache_parcours[(code, id_dept)]
+
+                for ordre, annee in parcours.get('annees', {}).items():
+                    noms = sorted((unicodedata.normalize('NFC', n) for n in annee.get('competences', {})),
+                                  key=lambda n: numeros.get(n, 0))
+                    ids = []
+                    for nom in noms:
+                        if (id_parcours, nom) not in cache_comp:
+                            cursor.execute("INSERT OR IGNORE INTO competence (nom, acronyme, id_parcours) VALUES (?, ?, ?)", (nom, f"C{numeros.get(nom, 0)}", id_parcours))
+                            cursor.execute("SELECT id_competence FROM competence WHERE id_parcours = ? AND nom = ?", (id_parcours, nom))
+                            cache_comp[(id_parcours, nom)] = cursor.fetchone()[0]
+                        ids.append(cache_comp[(id_parcours, nom)])
+                    comp.setdefault((id_formation, int(ordre)), []).append((code, tuple(ids), tuple(noms)))
+
+        return {'fs': formsemestres, 'comp': comp}
+
+    def _import_formations(self, cursor, formsemestres=None):
         # Logique identique à ton script
         annee_alternance = {2: 1, 1: 3, 3: 2, 4: 2, 5: 2, 8: 2} # GEA, CJ, GEII, INFO, RT, SD
         cursor.execute("SELECT id_departement FROM departement")
@@ -162,109 +705,9 @@ class DonneeService:
                         if a >= debut_fa: to_insert.append((a, d_id, 2)) # FA
         if 9 in all_depts: to_insert.append((2, 9, 1))
         if 10 in all_depts: to_insert.append((2, 10, 1))
+        # Années en alternance ouvertes d'après les formsemestres (ex. CJ en FA dès la 1re année)
+        for meta in (formsemestres or {}).values():
+            if MODALITES_RYTHME.get(meta['modalite']) == 2 and meta['niveau'] and meta['dept'] in all_depts \
+                    and meta['dept'] not in [9, 10]:
+                to_insert.append((min(meta['niveau'], 3), meta['dept'], 2))
         cursor.executemany("INSERT OR IGNORE INTO formation (annee_but, id_departement, id_rythme) VALUES (?, ?, ?)", to_insert)
-
-    def _import_inscriptions(self, cursor, dossier_json):
-        # Cache création
-        cursor.execute("SELECT acronyme, id_departement FROM departement")
-        cache_depts = {r[0].upper(): r[1] for r in cursor.fetchall()}
-        cursor.execute("SELECT ine, id_etudiant FROM etudiant")
-        cache_etus = {r[0].strip().lower(): r[1] for r in cursor.fetchall()}
-        cursor.execute("SELECT acronyme, id_decision FROM decision")
-        cache_dec = {r[0].upper(): r[1] for r in cursor.fetchall()}
-        cursor.execute("SELECT id_departement, annee_but, id_rythme, id_formation FROM formation")
-        cache_form = {(r[0], r[1], r[2]): r[3] for r in cursor.fetchall()}
-
-        files = glob.glob(os.path.join(dossier_json, "decisions_*.json"))
-        inscriptions = []
-
-        for f_path in files:
-            fname = os.path.basename(f_path)
-            id_dept = self._get_dept_id_from_name(fname, cache_depts)
-            if not id_dept: continue
-
-            annee_match = re.search(r'(\d{4})', fname)
-            annee_fic = int(annee_match.group(1)) if annee_match else None
-            
-            # Rythme de formation
-            is_fa = any(x in fname.lower() for x in ['fa', 'apprentissage', 'alternance', 'alt'])
-            id_rythme_fic = 2 if is_fa else 1
-
-            try:
-                with open(f_path, 'r', encoding='utf-8') as f:
-                    content = json.load(f)
-            except: continue
-
-            liste = content if isinstance(content, list) else content.get('etudiants', [])
-
-            for etu in liste:
-                ine = etu.get('etudid')
-                if not ine: continue
-                id_etudiant = cache_etus.get(str(ine).strip().lower())
-                if not id_etudiant: continue
-
-                # Decision extraction
-                dec_data = etu.get('decision', {}) if isinstance(etu.get('decision'), dict) else {}
-                ann_data = etu.get('annee', {}) if isinstance(etu.get('annee'), dict) else {}
-                sem_data = etu.get('semestre', {}) if isinstance(etu.get('semestre'), dict) else {}
-
-                c_dec = ann_data.get('code') or dec_data.get('code') or sem_data.get('code')
-                
-                # Fallback etats
-                etat_adm = etu.get('etat')
-                if not c_dec:
-                    if etat_adm == 'D': c_dec = 'DEM'
-                    elif etat_adm == 'DEF': c_dec = 'DEF'
-                    elif etat_adm == 'ABAN': c_dec = 'DEM'
-                    elif etat_adm == 'I': c_dec = 'INS'
-                
-                if not c_dec: continue
-
-                annee_reelle = annee_fic
-                if ann_data.get('annee_scolaire'):
-                    try: annee_reelle = int(ann_data.get('annee_scolaire'))
-                    except: pass
-                
-                if not annee_reelle: continue
-
-                id_decision = cache_dec.get(str(c_dec).upper())
-                
-                # Niveau / Formation
-                niveau = 1
-                ordre = str(ann_data.get('ordre', '')).upper()
-                if '3' in ordre: niveau = 3
-                elif '2' in ordre: niveau = 2
-                
-                # Passerelles
-                if id_dept in [cache_depts.get('P_SD_INFO'), cache_depts.get('P_CJ_GEA')]:
-                     id_form = cache_form.get((id_dept, 2, id_rythme_fic))
-                else:
-                    id_form = cache_form.get((id_dept, niveau, id_rythme_fic))
-
-                # FA
-                if not id_form and id_rythme_fic == 2:
-                    id_form = cache_form.get((id_dept, 2, 2)) or cache_form.get((id_dept, 3, 2))
-                
-                if not id_form: continue
-
-                id_etat = 2 if c_dec in ['DEM', 'DEF', 'ABAN', 'NI', 'D'] else 1
-                inscriptions.append((annee_reelle, id_etudiant, id_etat, id_form, id_decision))
-
-        cursor.executemany("INSERT OR IGNORE INTO inscription (annee_universitaire, id_etudiant, id_etat, id_formation, id_decision) VALUES (?, ?, ?, ?, ?)", inscriptions)
-        # On retourne le nombre d'inscriptions ajoutées
-        return cursor.rowcount
-
-
-    def _get_dept_id_from_name(self, name, cache):
-        name = name.lower()
-        if "passerelle" in name:
-            if any(x in name for x in ["sd", "info"]): return cache.get('P_SD_INFO')
-            if any(x in name for x in ["cj", "gea"]): return cache.get('P_CJ_GEA')
-            return None
-        if any(x in name for x in ["geii", "electrique"]): return cache.get('GEII')
-        if any(x in name for x in ["rt", "reseaux"]): return cache.get('RT')
-        if any(x in name for x in ["stid", "donn"]): return cache.get('STID')
-        if any(x in name for x in ["info", "informatique"]): return cache.get('INFO')
-        if any(x in name for x in ["cj", "juridique"]): return cache.get('CJ')
-        if "gea" in name: return cache.get('GEA')
-        return None
\ No newline at end of file
@@ -0,0 +1,72 @@
+import io
+import csv
+import json
+
+# Lignes par lot pour fetchmany et par groupe de lignes du format colonnes
+TAILLE_LOT = 1000
+
+FORMATS = {
+    # Types MIME seuls : Flask ajoute « ; charset=utf-8 » aux types text/*
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'colonnes': ('application/x-ndjson', 'cols.ndjson'),
+}
+
+
+class ExportService:
+    """
+    Sérialise un flux de lignes SQL (sqlite3.Row) sans jamais le matérialiser :
+    chaque lot lu par fetchmany est converti puis envoyé au client.
+    """
+    def stream(self, fmt, colonnes, lots):
+        """lots : itérable de listes de lignes ; retourne un générateur de str"""
+        if fmt == 'csv':
+            return self._iter_csv(colonnes, lots)
+        if fmt == 'ndjson':
+            return self._iter_ndjson(colonnes, lots)
+        if fmt == 'colonnes':
+            return self._iter_colonnes(colonnes, lots)
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+
+    def _iter_csv(self, colonnes, lots):
+        # BOM + ';' : ouverture directe dans un tableur configuré en français
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter=';')
+        buf.write('\ufeff')
+        writer.writerow(colonnes)
+        yield self._drain(buf)
+
+        for lot in lots:
+            writer.writerows([[row[c] for c in colonnes] for row in lot])
+            yield self._drain(buf)
+
+    def _iter_ndjson(self, colonnes, lots):
+        for lot in lots:
+            yield ''.join(json.dumps({c: row[c] for c in colonnes}, ensure_ascii=False) + '\n' for row in lot)
+
+    def _iter_colonnes(self, colonnes, lots):
+        """
+        Format colonnes compact, inspiré de Parquet : une ligne d'en-tête
+        puis un groupe de lignes par lot, stocké colonne par colonne.
+        Les colonnes texte répétitives sont encodées par dictionnaire
+        ({"dict": [valeurs], "index": [positions]}).
+        """
+        yield json.dumps({"format": "colonnes", "version": 1, "colonnes": colonnes}) + '\n'
+
+        for lot in lots:
+            groupe = {}
+            for c in colonnes:
+                valeurs = [row[c] for row in lot]
+                distinctes = list(dict.fromkeys(valeurs))
+                if valeurs and isinstance(valeurs[0], str) and len(distinctes) * 2 <= len(valeurs):
+                    position = {v: i for i, v in enumerate(distinctes)}
+                    groupe[c] = {"dict": distinctes, "index": [position[v] for v in valeurs]}
+                else:
+                    groupe[c] = valeurs
+            yield json.dumps({"n": len(lot), "colonnes": groupe}, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def _drain(self, buf):
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+        return data
@@ -0,0 +1,678 @@
+import os
+import re
+import sys
+import json
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Taille des blocs lus sur le disque par le parseur incrémental
+CHUNK_SIZE = 64 * 1024
+
+_WS = re.compile(r'[\s,]*')
+
+
+def iter_json_records(f_path, chunk_size=CHUNK_SIZE):
+    """
+    Parcourt un fichier decisions_*.json enregistrement par enregistrement,
+    sans jamais charger tout le fichier en mémoire.
+    Le fichier est une liste JSON ; chaque élément est décodé dès qu'il est
+    complet dans le tampon de lecture.
+    """
+    decoder = json.JSONDecoder()
+    with open(f_path, 'r', encoding='utf-8') as f:
+        buf = f.read(chunk_size)
+        pos = _WS.match(buf).end()
+        if pos >= len(buf):
+            return
+
+        # Ancien format { "etudiants": [...] } : lecture complète (fichiers rares et petits)
+        if buf[pos] == '{':
+            content = json.loads(buf[pos:] + f.read())
+            yield from content.get('etudiants', [])
+            return
+        if buf[pos] != '[':
+            raise ValueError(f"Format inattendu dans {os.path.basename(f_path)}")
+        pos += 1
+
+        while True:
+            pos = _WS.match(buf, pos).end()
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError("Tampon vide", buf, pos)
+                rec, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Enregistrement coupé par la fin du bloc : on recharge la suite
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            yield rec
+
+
+# Rythme associé à la modalité d'un formsemestre ScoDoc.
+# None : semestre sans formation locale (extérieur, licence), fichier ignoré.
+MODALITES_RYTHME = {'FI': 1, 'FC': 1, 'OTHER': 1, 'FAP': 2, 'CPRO': 2, 'EXT': None, 'LIC': None}
+
+# Motifs des enregistrements écartés à l'import (table rejet)
+MOTIFS_REJET = {
+    'fichier_illisible': "Fichier illisible ou JSON mal formé",
+    'enregistrement_invalide': "Enregistrement qui n'est pas un objet JSON",
+    'sans_etudid': "Enregistrement sans etudid",
+    'semestre_exclu': "Semestre hors BUT local (extérieur, licence)",
+    'departement_inconnu': "Département du fichier non reconnu",
+    'sans_decision': "Ni décision de jury ni état administratif",
+    'sans_annee': "Année universitaire introuvable",
+    'formation_inconnue': "Aucune formation pour ce département, niveau et rythme",
+    'doublon': "Inscription identique retenue depuis un fichier prioritaire",
+    'conflit': "Inscription différente de celle retenue depuis un fichier prioritaire",
+}
+
+
+def _mots(*mots):
+    """Motif précompilé : un des mots, délimité par '_', '-', espace ou ponctuation"""
+    return re.compile(r'(?<![a-z0-9])(?:' + '|'.join(mots) + r')(?![a-z0-9])')
+
+_FS_ID = re.compile(r'_fs_(\d+)')
+_ANNEE = re.compile(r'(\d{4})')
+_PASSERELLE = re.compile(r'passerelle')
+_PASSERELLE_SD_INFO = _mots('sd', 'info')
+_PASSERELLE_CJ_GEA = _mots('cj', 'gea')
+# Ordre significatif : "Génie Electrique et Informatique Industrielle" avant INFO
+_DEPTS_MOTIFS = [
+    ('GEII', _mots('geii', 'electrique')),
+    ('RT', _mots('rt', 'r_t', 'reseaux')),
+    ('STID', _mots('stid', 'sd', r'donn\w*')),
+    ('INFO', _mots('info', 'informatique')),
+    ('CJ', _mots('cj', 'juridiques?')),
+    ('GEA', _mots('gea')),
+]
+_FA = _mots('fa', 'fap', 'apprentissage', 'alternance', 'altenance', 'alt')
+
+
+def get_dept_id_from_name(name, cache):
+    """Devine le département à partir d'un nom de fichier ou d'un titre (mots entiers)"""
+    name = name.lower()
+    if _PASSERELLE.search(name):
+        if _PASSERELLE_SD_INFO.search(name): return cache.get('P_SD_INFO')
+        if _PASSERELLE_CJ_GEA.search(name): return cache.get('P_CJ_GEA')
+        return None
+    for acronyme, motif in _DEPTS_MOTIFS:
+        if motif.search(name):
+            return cache.get(acronyme)
+    return None
+
+
+def fs_metadata(fname, refs):
+    """Métadonnées du formsemestre fs_<id> du nom de fichier (None si inconnu)"""
+    referentiels = refs.get('referentiels')
+    m = _FS_ID.search(fname)
+    if not referentiels or not m:
+        return None
+    return referentiels['fs'].get(int(m.group(1)))
+
+
+def file_priority(fname, formsemestres):
+    """
+    Clé de tri des fichiers de décisions : quand plusieurs fichiers donnent une
+    inscription pour le même étudiant et la même année, celle du fichier de plus
+    haute priorité est retenue. Le jury le plus récent l'emporte (le semestre pair,
+    qui commence après l'impair, porte la décision annuelle), puis le semestre le
+    plus avancé et le formsemestre le plus récent ; les fichiers sans formsemestre
+    connu passent après les autres, départagés par leur nom.
+    """
+    m = _FS_ID.search(fname)
+    meta = formsemestres.get(int(m.group(1))) if m and formsemestres else None
+    if meta is None:
+        return ('', 0, 0, fname)
+    return (meta.get('debut') or '', meta.get('semestre') or 0, int(m.group(1)), fname)
+
+
+def classify_file(fname, refs):
+    """
+    Retourne (id_dept, annee_fic, id_rythme_fic, niveau_fic) pour un fichier de décisions.
+    Le formsemestre du nom (fs_<id>) fait foi : département, année universitaire,
+    niveau et rythme sont lus dans l'index des formsemestres. Les heuristiques sur
+    le nom ne servent que pour un fichier sans formsemestre connu (niveau_fic vaut None).
+    id_dept vaut None si le département n'est pas reconnu ou le semestre non importable.
+    """
+    meta = fs_metadata(fname, refs)
+    if meta is not None:
+        return classify_formsemestre(meta, fname, refs)
+
+    id_dept = get_dept_id_from_name(fname, refs['depts'])
+
+    annee_match = _ANNEE.search(fname)
+    annee_fic = int(annee_match.group(1)) if annee_match else None
+
+    # Rythme de formation
+    id_rythme_fic = 2 if _FA.search(fname.lower()) else 1
+
+    return id_dept, annee_fic, id_rythme_fic, None
+
+
+def classify_formsemestre(meta, fname, refs):
+    """Classement d'un fichier à partir des métadonnées de son formsemestre"""
+    modalite = meta.get('modalite')
+    if modalite in MODALITES_RYTHME:
+        id_rythme = MODALITES_RYTHME[modalite]
+    else:
+        id_rythme = 2 if _FA.search(fname.lower()) else 1
+    if id_rythme is None:
+        return None, meta.get('annee'), None, meta.get('niveau')
+
+    # Les passerelles sont des départements à part dans la base
+    titre = meta.get('titre') or ''
+    if _PASSERELLE.search(titre.lower()):
+        id_dept = get_dept_id_from_name(titre, refs['depts'])
+    else:
+        id_dept = meta.get('dept') if meta.get('dept') in refs['depts'].values() else None
+
+    return id_dept, meta.get('annee'), id_rythme, meta.get('niveau')
+
+
+def get_niveau(ann_data, defaut=None):
+    """
+    Année de BUT (1 à 3) déduite de annee.ordre.
+    Sans ordre, niveau du formsemestre (defaut), sinon 1.
+    """
+    ordre = str(ann_data.get('ordre', '')).upper()
+    if '3' in ordre: return 3
+    if '2' in ordre: return 2
+    if '1' in ordre: return 1
+    return defaut or 1
+
+
+def file_competences(fname, refs):
+    """
+    Compétences candidates pour un fichier, par année de BUT :
+    {niveau: [(ids_competences, noms), ...]} (une entrée par parcours possible).
+    Le formsemestre (fs_<id> du nom) donne la formation et ses parcours ouverts.
+    """
+    meta = fs_metadata(fname, refs)
+    if not meta:
+        return {}
+
+    referentiels = refs['referentiels']
+    result = {}
+    for niveau in (1, 2, 3):
+        candidats = referentiels['comp'].get((meta['formation'], niveau), [])
+        ouverts = [c for c in candidats if c[0] in meta['parcours']]
+        result[niveau] = [(ids, noms) for _, ids, noms in (ouverts or candidats)]
+    return result
+
+
+def extract_evaluations(etu, candidats, refs, niveau_fic=None):
+    """
+    Associe chaque RCUE de l'enregistrement à une compétence.
+    Les RCUE suivent l'ordre des compétences (numero) de l'année ; si plusieurs
+    parcours restent possibles, seules les positions où ils désignent la même
+    compétence sont gardées.
+    Retourne un tuple de (id_competence, id_decision, moyenne).
+    """
+    rcues = etu.get('rcues')
+    if not rcues or not isinstance(rcues, list):
+        return ()
+
+    ann_data = etu.get('annee', {}) if isinstance(etu.get('annee'), dict) else {}
+    possibles = [c for c in candidats.get(get_niveau(ann_data, niveau_fic), []) if len(c[0]) == len(rcues)]
+    if not possibles:
+        return ()
+
+    ids, noms = possibles[0]
+    evaluations = []
+    for k, rcue in enumerate(rcues):
+        if not isinstance(rcue, dict):
+            continue
+        if any(autres[k] != noms[k] for _, autres in possibles[1:]):
+            continue
+        try:
+            moyenne = round(float(rcue.get('moy')), 2)
+        except (TypeError, ValueError):
+            moyenne = None
+        code = rcue.get('code')
+        id_decision = refs['dec'].get(str(code).upper()) if code else None
+        evaluations.append((ids[k], id_decision, moyenne))
+    return tuple(evaluations)
+
+
+def extract_inscription(etu, id_dept, annee_fic, id_rythme_fic, refs, niveau_fic=None):
+    """
+    Transforme un enregistrement jury en couple (inscription, motif) :
+    inscription = (annee_universitaire, id_etat, id_formation, id_decision),
+    ou None si elle ne peut pas être placée, motif (clé de MOTIFS_REJET) dit alors pourquoi.
+    """
+    cache_depts = refs['depts']
+    cache_dec = refs['dec']
+    cache_form = refs['form']
+
+    # Decision extraction
+    dec_data = etu.get('decision', {}) if isinstance(etu.get('decision'), dict) else {}
+    ann_data = etu.get('annee', {}) if isinstance(etu.get('annee'), dict) else {}
+    sem_data = etu.get('semestre', {}) if isinstance(etu.get('semestre'), dict) else {}
+
+    c_dec = ann_data.get('code') or dec_data.get('code') or sem_data.get('code')
+
+    # Fallback etats
+    etat_adm = etu.get('etat')
+    if not c_dec:
+        if etat_adm == 'D': c_dec = 'DEM'
+        elif etat_adm == 'DEF': c_dec = 'DEF'
+        elif etat_adm == 'ABAN': c_dec = 'DEM'
+        elif etat_adm == 'I': c_dec = 'INS'
+
+    if not c_dec: return None, 'sans_decision'
+
+    annee_reelle = annee_fic
+    if ann_data.get('annee_scolaire'):
+        try: annee_reelle = int(ann_data.get('annee_scolaire'))
+        except (TypeError, ValueError): pass
+
+    if not annee_reelle: return None, 'sans_annee'
+
+    id_decision = cache_dec.get(str(c_dec).upper())
+
+    # Niveau / Formation
+    niveau = get_niveau(ann_data, niveau_fic)
+
+    # Passerelles
+    if id_dept in [cache_depts.get('P_SD_INFO'), cache_depts.get('P_CJ_GEA')]:
+        id_form = cache_form.get((id_dept, 2, id_rythme_fic))
+    else:
+        id_form = cache_form.get((id_dept, niveau, id_rythme_fic))
+
+    # FA
+    if not id_form and id_rythme_fic == 2:
+        id_form = cache_form.get((id_dept, 2, 2)) or cache_form.get((id_dept, 3, 2))
+
+    if not id_form: return None, 'formation_inconnue'
+
+    id_etat = 2 if c_dec in ['DEM', 'DEF', 'ABAN', 'NI', 'D'] else 1
+    return (annee_reelle, id_etat, id_form, id_decision), None
+
+
+def iter_file_rows(f_path, refs, rejets=None):
+    """
+    Lit un fichier une seule fois et produit, pour chaque étudiant,
+    le couple (ine, inscription) où inscription peut valoir None
+    (l'étudiant est connu mais son inscription n'est pas exploitable).
+    Les enregistrements écartés sont ajoutés à rejets (liste facultative)
+    sous la forme (motif, etudid) : la validation se fait pendant cette même lecture.
+    """
+    fname = os.path.basename(f_path)
+    id_dept, annee_fic, id_rythme_fic, niveau_fic = classify_file(fname, refs)
+    candidats = file_competences(fname, refs)
+    if rejets is None:
+        rejets = []
+    motif_fichier = None if id_dept else ('semestre_exclu' if id_rythme_fic is None else 'departement_inconnu')
+
+    for etu in iter_json_records(f_path):
+        if not isinstance(etu, dict):
+            rejets.append(('enregistrement_invalide', None))
+            continue
+        ine = etu.get('etudid')
+        if not ine:
+            rejets.append(('sans_etudid', None))
+            continue
+
+        inscription, motif = None, motif_fichier
+        if id_dept:
+            inscription, motif = extract_inscription(etu, id_dept, annee_fic, id_rythme_fic, refs, niveau_fic)
+            if inscription is not None:
+                inscription += (extract_evaluations(etu, candidats, refs, niveau_fic),)
+        if motif:
+            rejets.append((motif, str(ine)))
+        yield ine, inscription
+
+
+# Tables de référence copiées une fois dans chaque processus de travail
+_worker_refs = None
+
+
+def _init_worker(refs):
+    global _worker_refs
+    _worker_refs = refs
+
+
+def parse_file(f_path):
+    """
+    Tâche exécutée dans un processus de travail : convertit un fichier
+    en liste compacte de tuples (ine, inscription), avec ses rejets.
+    Retourne aussi le message d'erreur éventuel, les lignes déjà lues
+    restant exploitables comme dans le chemin séquentiel.
+    """
+    rows, rejets = [], []
+    try:
+        for row in iter_file_rows(f_path, _worker_refs, rejets):
+            rows.append(row)
+    except (OSError, ValueError) as e:
+        return f_path, rows, rejets, str(e)
+    return f_path, rows, rejets, None
+
+
+def peak_rss_mo():
+    """Pic de mémoire résidente du processus en Mo (None si indisponible)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en Ko sous Linux
+    if sys.platform == 'darwin':
+        pic //= 1024
+    return round(pic / 1024, 1)
+
+
+class ImportEngine:
+    """
+    Moteur d'import en une seule passe : chaque fichier de décisions est lu
+    une fois, en flux, et alimente à la fois les tables etudiant et inscription.
+    fichiers : {id_fichier: (rang, chemin)} pour tous les fichiers présents ; pour
+    un même étudiant et une même année, l'inscription du fichier de rang le plus
+    élevé est retenue, quel que soit l'ordre de lecture (voir file_priority).
+    Les lignes sont écrites par lots de taille bornée, de même que les
+    enregistrements écartés (table rejet, avec leur motif).
+    """
+    def __init__(self, cursor, batch_size=5000, referentiels=None, fichiers=None):
+        self.cursor = cursor
+        self.batch_size = batch_size
+        self.refs = {'referentiels': referentiels}
+        self.fichiers = fichiers or {}
+        self.cache_etus = {}
+        self.ines_vus = set()
+        self._etus_en_attente = {}
+        self._insc_en_attente = []
+        self.nb_etudiants_ajoutes = 0
+        self.nb_inscriptions_ajoutees = 0
+        self.nb_inscriptions_remplacees = 0
+        self.nb_evaluations_ajoutees = 0
+        self.duree_evaluations = 0.0
+        self._nb_evals_en_attente = 0
+        self._rejets_en_attente = []
+        self.rejets = {}
+        self.nb_ecartes = 0
+        self._dernier_rejet = 0
+        self.cles = set()
+        self.progress = None
+
+    def load_caches(self):
+        """Charge les tables de référence nécessaires à l'extraction"""
+        cursor = self.cursor
+        cursor.execute("SELECT acronyme, id_departement FROM departement")
+        self.refs['depts'] = {r[0].upper(): r[1] for r in cursor.fetchall()}
+        cursor.execute("SELECT acronyme, id_decision FROM decision")
+        self.refs['dec'] = {r[0].upper(): r[1] for r in cursor.fetchall()}
+        cursor.execute("SELECT id_departement, annee_but, id_rythme, id_formation FROM formation")
+        self.refs['form'] = {(r[0], r[1], r[2]): r[3] for r in cursor.fetchall()}
+        cursor.execute("SELECT ine, id_etudiant FROM etudiant")
+        self.cache_etus = {r[0].strip().lower(): r[1] for r in cursor.fetchall()}
+
+    def run(self, files, workers=1, progress=None, relectures=(), cles=None):
+        """
+        Importe la liste de fichiers [(chemin, id_fichier), ...]
+        et retourne les statistiques.
+        relectures : fichiers déjà importés [(chemin, id_fichier), ...] dont seules
+        les inscriptions des clés cles {(etudid, année)} sont reprises (restauration
+        après la purge d'un fichier qui les avait emportées) ; leurs autres rejets sont déjà en base.
+        Avec workers > 1, le décodage est réparti sur un pool de processus
+        et seul le processus courant écrit dans la base.
+        progress(fichiers_faits, fichiers_total, lignes_ecrites) est appelé
+        après chaque fichier.
+        """
+        debut = time.perf_counter()
+        self.progress = progress
+        self.cles = cles or set()
+        self.load_caches()
+        self.cursor.execute("SELECT IFNULL(MAX(id_rejet), 0) FROM rejet")
+        self._dernier_rejet = self.cursor.fetchone()[0]
+
+        taches = [(f_path, id_fichier, False) for f_path, id_fichier in files] + \
+                 [(f_path, id_fichier, True) for f_path, id_fichier in relectures]
+        if workers > 1 and len(taches) > 1:
+            self._run_parallel(taches, workers)
+        else:
+            workers = 1
+            for n, (f_path, id_fichier, partiel) in enumerate(taches, 1):
+                rejets = []
+                erreur = None
+                try:
+                    self._ajouter_fichier(iter_file_rows(f_path, self.refs, rejets), id_fichier, partiel)
+                except (OSError, ValueError) as e:
+                    erreur = str(e)
+                if not partiel:
+                    self.add_rejets(f_path, id_fichier, rejets, erreur)
+                self._report(n, len(taches))
+        self.flush()
+        self._classer_ecartes()
+        self._report(len(taches), len(taches))
+
+        nb_total = len(self.ines_vus)
+        return {
+            "total_distincts": nb_total,
+            "nouveaux": self.nb_etudiants_ajoutes,
+            "connus": nb_total - self.nb_etudiants_ajoutes,
+            "inscriptions": self.nb_inscriptions_ajoutees,
+            "inscriptions_remplacees": self.nb_inscriptions_remplacees,
+            "evaluations": self.nb_evaluations_ajoutees,
+            "rejets": sum(self.rejets.values()),
+            "rejets_par_motif": dict(self.rejets),
+            "duree_evaluations": round(self.duree_evaluations, 3),
+            "fichiers": len(files),
+            "fichiers_relus": len(relectures),
+            "duree": round(time.perf_counter() - debut, 2),
+            "rss_pic_mo": peak_rss_mo(),
+            "workers": workers,
+        }
+
+    def _run_parallel(self, taches, workers):
+        """Décodage parallèle, écriture séquentielle dans l'ordre des fichiers"""
+        # 'spawn' évite de dupliquer par fork un serveur web multi-thread
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(self.refs,)) as pool:
+            # map conserve l'ordre : écriture dans l'ordre de la liste, comme en séquentiel
+            chemins = [f_path for f_path, _, _ in taches]
+            resultats = pool.map(parse_file, chemins, chunksize=4)
+            for n, ((f_path, rows, rejets, erreur), (_, id_fichier, partiel)) in enumerate(zip(resultats, taches), 1):
+                self._ajouter_fichier(rows, id_fichier, partiel)
+                if not partiel:
+                    self.add_rejets(f_path, id_fichier, rejets, erreur)
+                self._report(n, len(taches))
+
+    def _ajouter_fichier(self, rows, id_fichier, partiel):
+        """Ajoute les couples (ine, inscription) d'un fichier ; en relecture partielle, seulement ceux des clés à restaurer"""
+        for ine, inscription in rows:
+            if partiel and (inscription is None or (str(ine).strip().lower(), inscription[0]) not in self.cles):
+                continue
+            self.add_row(ine, inscription, id_fichier)
+
+    def _report(self, faits, total):
+        if self.progress:
+            self.progress(faits, total, self.nb_etudiants_ajoutes + self.nb_inscriptions_ajoutees)
+
+    def add_row(self, ine, inscription, id_fichier=None):
+        """Enregistre un couple (ine, inscription) dans le lot courant"""
+        key = str(ine).strip().lower()
+        self.ines_vus.add(key)
+        if key not in self.cache_etus and key not in self._etus_en_attente:
+            self._etus_en_attente[key] = ine
+
+        if inscription is not None:
+            self._insc_en_attente.append((key,) + inscription + (id_fichier,))
+            self._nb_evals_en_attente += len(inscription[4])
+
+        en_attente = len(self._insc_en_attente) + len(self._etus_en_attente) + self._nb_evals_en_attente
+        if en_attente >= self.batch_size:
+            self.flush()
+
+    def add_rejets(self, f_path, id_fichier, rejets, erreur=None):
+        """Enregistre les rejets d'un fichier (et son erreur de lecture éventuelle) dans le lot courant"""
+        if erreur:
+            print(f"Fichier ignoré ({os.path.basename(f_path)}) : {erreur}")
+            rejets.append(('fichier_illisible', None))
+        for motif, etudid in rejets:
+            self.rejets[motif] = self.rejets.get(motif, 0) + 1
+            self._rejets_en_attente.append((id_fichier, motif, etudid, None, erreur if motif == 'fichier_illisible' else None,
+                                            None, None, None, None))
+
+        if len(self._rejets_en_attente) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Écrit le lot courant : d'abord les étudiants, puis leurs inscriptions"""
+        cursor = self.cursor
+        db = cursor.connection
+
+        if self._etus_en_attente:
+            avant = db.total_changes
+            cursor.executemany("INSERT OR IGNORE INTO etudiant (ine) VALUES (?)",
+                               [(ine,) for ine in self._etus_en_attente.values()])
+            self.nb_etudiants_ajoutes += db.total_changes - avant
+
+            # Récupération des identifiants attribués (par paquets pour rester sous la limite de paramètres)
+            ines = list(self._etus_en_attente.values())
+            for i in range(0, len(ines), 500):
+                paquet = ines[i:i + 500]
+                cursor.execute(f"SELECT ine, id_etudiant FROM etudiant WHERE ine IN ({','.join('?' * len(paquet))})", paquet)
+                for r in cursor.fetchall():
+                    self.cache_etus[r[0].strip().lower()] = r[1]
+            self._etus_en_attente.clear()
+
+        if self._insc_en_attente:
+            self._flush_inscriptions()
+            self._nb_evals_en_attente = 0
+
+        if self._rejets_en_attente:
+            cursor.executemany("INSERT INTO rejet (id_fichier, motif, etudid, annee_universitaire, detail, id_inscription, id_etat, id_formation, id_decision) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               self._rejets_en_attente)
+            self._rejets_en_attente.clear()
+
+    def _rang(self, id_fichier):
+        return self.fichiers.get(id_fichier, (-1, None))[0]
+
+    def _flush_inscriptions(self):
+        """
+        Écrit les inscriptions du lot, une seule par (étudiant, année) : celle du
+        fichier de plus haut rang, qu'elle soit dans le lot ou déjà en base.
+        À rang égal (même fichier), la première lue est gardée. Une inscription
+        remplacée perd les moyennes de compétences de son ancien fichier.
+        Chaque enregistrement écarté est signalé dans son fichier, avec ses valeurs
+        et l'inscription retenue (voir _classer_ecartes).
+        """
+        cursor = self.cursor
+        db = cursor.connection
+
+        # Meilleur enregistrement du lot pour chaque (étudiant, année)
+        lot = {}
+        ecartes = []
+        for key, annee, id_etat, id_form, id_decision, evaluations, id_fichier in self._insc_en_attente:
+            id_etudiant = self.cache_etus.get(key)
+            if not id_etudiant:
+                continue
+            cle = (id_etudiant, annee)
+            ligne = (self._rang(id_fichier), id_etat, id_form, id_decision, evaluations, id_fichier, key)
+            autre = lot.get(cle)
+            if autre is None or ligne[0] > autre[0]:
+                lot[cle] = ligne
+            if autre is not None:
+                perdant = autre if lot[cle] is ligne else ligne
+                ecartes.append([cle, perdant[5], perdant[6], annee] + list(perdant[1:4]))
+        self._insc_en_attente.clear()
+
+        existantes = self._inscriptions_existantes({cle[0] for cle in lot})
+
+        nouvelles, remplacees, a_evaluer = [], [], []
+        for cle, (rang, id_etat, id_form, id_decision, evaluations, id_fichier, key) in lot.items():
+            existante = existantes.get(cle)
+            if existante is None:
+                nouvelles.append((cle[1], cle[0], id_etat, id_form, id_decision, id_fichier))
+                if evaluations:
+                    a_evaluer.append((cle, evaluations))
+            elif rang > self._rang(existante[1]):
+                remplacees.append((id_etat, id_form, id_decision, id_fichier, existante[0]))
+                a_evaluer.append((existante[0], evaluations))
+                ecartes.append([existante[0], existante[1], key, cle[1]] + list(existante[2:]))
+            else:
+                ecartes.append([existante[0], id_fichier, key, cle[1], id_etat, id_form, id_decision])
+
+        avant = db.total_changes
+        cursor.executemany("INSERT INTO inscription (annee_universitaire, id_etudiant, id_etat, id_formation, id_decision, id_fichier) VALUES (?, ?, ?, ?, ?, ?)", nouvelles)
+        self.nb_inscriptions_ajoutees += db.total_changes - avant
+
+        if remplacees:
+            avant = db.total_changes
+            cursor.executemany("DELETE FROM evaluer WHERE id_inscription = ?", [(r[4],) for r in remplacees])
+            self.nb_evaluations_ajoutees -= db.total_changes - avant
+            cursor.executemany("UPDATE inscription SET id_etat = ?, id_formation = ?, id_decision = ?, id_fichier = ? WHERE id_inscription = ?", remplacees)
+            self.nb_inscriptions_remplacees += len(remplacees)
+
+        # Identifiants des inscriptions créées par le lot (moyennes et rejets y font référence)
+        a_relire = {c[0] for c, _ in a_evaluer if isinstance(c, tuple)} | {e[0][0] for e in ecartes if isinstance(e[0], tuple)}
+        creees = self._inscriptions_existantes(a_relire) if a_relire else {}
+
+        if a_evaluer:
+            self._flush_evaluations([(creees[c][0] if isinstance(c, tuple) else c, evaluations) for c, evaluations in a_evaluer])
+
+        for e in ecartes:
+            if isinstance(e[0], tuple):
+                e[0] = creees[e[0]][0]
+            # Motif provisoire, fixé en fin d'import par _classer_ecartes
+            self._rejets_en_attente.append((e[1], 'conflit', e[2], e[3], None, e[0], e[4], e[5], e[6]))
+            self.nb_ecartes += 1
+
+    def _inscriptions_existantes(self, ids_etudiants):
+        """
+        (id_etudiant, année) -> (id_inscription, id_fichier, id_etat, id_formation, id_decision),
+        via l'index UNIQUE (id_etudiant, annee)
+        """
+        cursor = self.cursor
+        ids_etudiants = list(ids_etudiants)
+        existantes = {}
+        for i in range(0, len(ids_etudiants), 500):
+            paquet = ids_etudiants[i:i + 500]
+            cursor.execute(f"SELECT id_etudiant, annee_universitaire, id_inscription, id_fichier, id_etat, id_formation, id_decision FROM inscription WHERE id_etudiant IN ({','.join('?' * len(paquet))})", paquet)
+            for r in cursor.fetchall():
+                existantes[(r[0], r[1])] = tuple(r[2:])
+        return existantes
+
+    def _classer_ecartes(self):
+        """
+        Motif des inscriptions écartées, comparées à l'inscription finalement retenue :
+        doublon si état, formation et décision sont identiques, conflit sinon.
+        Calculé une fois tous les fichiers écrits, le résultat ne dépend pas de l'ordre de lecture ;
+        les rejets des imports précédents sont reclassés aussi (leur inscription retenue a pu changer).
+        """
+        if not self.nb_ecartes and not self.nb_inscriptions_remplacees:
+            return
+        self.cursor.execute("""
+            UPDATE rejet SET motif = CASE WHEN EXISTS (
+                SELECT 1 FROM inscription i
+                WHERE i.id_inscription = rejet.id_inscription
+                  AND i.id_etat = rejet.id_etat AND i.id_formation = rejet.id_formation
+                  AND i.id_decision IS rejet.id_decision)
+                THEN 'doublon' ELSE 'conflit' END
+            WHERE motif IN ('doublon', 'conflit')""")
+        self.cursor.execute("SELECT motif, COUNT(*) FROM rejet WHERE motif IN ('doublon', 'conflit') AND id_rejet > ? GROUP BY motif",
+                            (self._dernier_rejet,))
+        for motif, nb in self.cursor.fetchall():
+            self.rejets[motif] = nb
+
+    def _flush_evaluations(self, a_evaluer):
+        """Écrit les moyennes de compétences des inscriptions retenues du lot : [(id_inscription, évaluations)]"""
+        debut = time.perf_counter()
+        cursor = self.cursor
+        db = cursor.connection
+
+        lignes = []
+        for id_inscription, evaluations in a_evaluer:
+            for id_competence, id_decision, moyenne in evaluations:
+                lignes.append((id_inscription, id_competence, id_decision, moyenne))
+
+        avant = db.total_changes
+        cursor.executemany("INSERT OR IGNORE INTO evaluer (id_inscription, id_competence, id_decision, moyenne) VALUES (?, ?, ?, ?)", lignes)
+        self.nb_evaluations_ajoutees += db.total_changes - avant
+        self.duree_evaluations += time.perf_counter() - debut
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from flask import current_app
+from app.services.DonneeService import DonneeService
+from app.ConnectionPool import pool
+
+# Table des jobs, dans une base SQLite à part (JOBS_DATABASE)
+SCHEMA_JOBS = """
+CREATE TABLE IF NOT EXISTS sync_job(
+    id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    etat TEXT NOT NULL,
+    fichiers_faits INTEGER NOT NULL DEFAULT 0,
+    fichiers_total INTEGER,
+    lignes_ecrites INTEGER NOT NULL DEFAULT 0,
+    debut REAL NOT NULL,
+    fin REAL,
+    stats TEXT,
+    erreur TEXT,
+    pid INTEGER NOT NULL
+)
+"""
+
+
+def _processus_actif(pid):
+    """Le processus pid tourne-t-il encore sur cette machine ?"""
+    if pid == os.getpid() or os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SyncJobRunner:
+    """
+    Exécute les synchronisations dans un thread d'arrière-plan.
+    Une seule synchronisation tourne à la fois, tous processus confondus :
+    l'état des jobs est gardé dans la table sync_job d'une petite base SQLite
+    (JOBS_DATABASE), consultable depuis n'importe quel worker gunicorn pendant
+    et après l'exécution. Ce n'est pas la base de l'application, verrouillée en
+    écriture pendant toute une synchronisation et remplacée par une reconstruction.
+    mode 'synchro' : synchronisation incrémentale ;
+    mode 'reconstruction' : reconstruction complète en chargement en masse.
+    """
+    MODES = ('synchro', 'reconstruction')
+
+    # Nombre de jobs conservés pour consultation
+    MAX_JOBS = 20
+
+    def start(self, app, mode='synchro'):
+        """
+        Lance une synchronisation (ou une reconstruction) si aucune n'est en cours.
+        Retourne (job_id, cree) : cree vaut False si un job tournait déjà.
+        """
+        db = self._connect(app.config['JOBS_DATABASE'])
+        try:
+            # Vérification et création sous le même verrou : un seul job même entre workers
+            db.execute("BEGIN IMMEDIATE")
+            self._expirer(db)
+            courant = db.execute("SELECT id FROM sync_job WHERE etat = 'en_cours'").fetchone()
+            if courant:
+                db.rollback()
+                return courant['id'], False
+
+            job_id = uuid.uuid4().hex
+            db.execute("INSERT INTO sync_job (id, mode, etat, debut, pid) VALUES (?, ?, 'en_cours', ?, ?)",
+                       (job_id, mode, time.time(), os.getpid()))
+            db.execute("DELETE FROM sync_job WHERE id NOT IN (SELECT id FROM sync_job ORDER BY debut DESC LIMIT ?)",
+                       (self.MAX_JOBS,))
+            db.commit()
+        finally:
+            db.close()
+
+        thread = threading.Thread(target=self._run, args=(app, job_id, mode),
+                                  name=f"sync-{job_id[:8]}", daemon=True)
+        thread.start()
+        return job_id, True
+
+    def get(self, job_id):
+        """Retourne l'état du job (None s'il est inconnu)"""
+        db = self._connect(current_app.config['JOBS_DATABASE'])
+        try:
+            self._expirer(db)
+            row = db.execute("SELECT * FROM sync_job WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            db.close()
+        if row is None:
+            return None
+        etat = dict(row)
+        del etat["pid"]
+        etat["stats"] = json.loads(etat["stats"]) if etat["stats"] else None
+        fin = etat.pop("fin") or time.time()
+        etat["duree"] = round(fin - etat.pop("debut"), 2)
+        return etat
+
+    def is_running(self):
+        db = self._connect(current_app.config['JOBS_DATABASE'])
+        try:
+            self._expirer(db)
+            return db.execute("SELECT 1 FROM sync_job WHERE etat = 'en_cours'").fetchone() is not None
+        finally:
+            db.close()
+
+    def dernieres_etapes(self):
+        """Étapes de la dernière synchronisation terminée (identiques quel que soit le worker)"""
+        db = self._connect(current_app.config['JOBS_DATABASE'])
+        try:
+            row = db.execute("SELECT stats FROM sync_job WHERE etat = 'termine' ORDER BY fin DESC LIMIT 1").fetchone()
+        finally:
+            db.close()
+        if row is None or not row['stats']:
+            return None
+        return json.loads(row['stats']).get("etapes")
+
+    def _connect(self, chemin):
+        # Connexion courte, transactions explicites ; état éphémère, sans fsync
+        db = sqlite3.connect(chemin, timeout=10, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA synchronous = OFF")
+        db.execute(SCHEMA_JOBS)
+        return db
+
+    def _expirer(self, db):
+        """Un job dont le processus a disparu (worker tué ou redémarré) ne bloque plus les suivants"""
+        for row in db.execute("SELECT id, pid FROM sync_job WHERE etat = 'en_cours'").fetchall():
+            if not _processus_actif(row['pid']):
+                db.execute("UPDATE sync_job SET etat = 'erreur', erreur = ?, fin = ? WHERE id = ?",
+                           ("Processus interrompu avant la fin du job.", time.time(), row['id']))
+
+    def _run(self, app, job_id, mode):
+        db = self._connect(app.config['JOBS_DATABASE'])
+
+        def update(**valeurs):
+            colonnes = ', '.join(f"{k} = ?" for k in valeurs)
+            db.execute(f"UPDATE sync_job SET {colonnes} WHERE id = ?", (*valeurs.values(), job_id))
+
+        def progress(faits, total, lignes):
+            update(fichiers_faits=faits, fichiers_total=total, lignes_ecrites=lignes)
+
+        with app.app_context():
+            try:
+                service = DonneeService()
+                if mode == 'reconstruction':
+                    stats = service.rebuild_database(progress=progress)
+                else:
+                    stats = service.run_import_pipeline(progress=progress)
+                if stats is None:
+                    update(etat="erreur", erreur="Fichiers de configuration manquants.", fin=time.time())
+                else:
+                    update(etat="termine", stats=json.dumps(stats), fin=time.time())
+            except Exception as e:
+                update(etat="erreur", erreur=str(e), fin=time.time())
+            finally:
+                db.close()
+
+        # Le thread se termine : ses connexions du pool aussi
+        pool.close_thread()
+
+
+# Instance partagée par le processus (l'état, lui, est dans JOBS_DATABASE)
+sync_runner = SyncJobRunner()
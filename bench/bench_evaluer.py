@@ -0,0 +1,42 @@
+"""
+Débit de l'étape d'import des moyennes de compétences (table evaluer).
+
+Lance un import complet dans une base temporaire et affiche le nombre de
+lignes evaluer écrites, le temps passé dans leur écriture par lots et le
+débit obtenu (lignes par seconde), à côté du débit global de l'import.
+
+Usage : python bench/bench_evaluer.py [nombre_de_répétitions]
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.DonneeDAO import DonneeDAO
+from app.services.DonneeService import DonneeService
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app()
+        app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+
+        for n in range(1, repetitions + 1):
+            with app.app_context():
+                DonneeDAO().init_db()
+                stats = DonneeService().run_import_pipeline()
+
+            lignes = stats['evaluations']
+            debit_etape = lignes / stats['duree_evaluations'] if stats['duree_evaluations'] else 0
+            debit_global = (stats['inscriptions'] + lignes) / stats['duree'] if stats['duree'] else 0
+            print(f"essai {n} : {lignes} lignes evaluer en {stats['duree_evaluations']:.3f} s "
+                  f"-> {debit_etape:,.0f} lignes/s (import complet {stats['duree']:.2f} s, "
+                  f"{debit_global:,.0f} lignes inscription+evaluer/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Suite de benchmarks : import, recherche et rendu des pages, à plusieurs échelles.
+
+Pour chaque échelle, un corpus synthétique est généré (voir synthetic_data.py)
+dans un dossier temporaire, puis on mesure :
+  - run_import_pipeline sur une base vide, une resynchronisation sans changement,
+    puis une reconstruction complète en chargement en masse ;
+  - search_etudiants pour chaque combinaison année / département / rythme,
+    résultats complets et première page ;
+  - le rendu des pages (/, recherche POST, /stats) via le client de test Flask,
+    cache applicatif vidé avant chaque requête.
+Les résultats sont écrits en JSON (avec le commit courant) pour comparer
+deux commits : --comparer ancien.json affiche les écarts.
+
+Usage : python bench/bench_suite.py [--echelles 1,10,100] [--sortie resultats.json]
+                                    [--repetitions 3] [--comparer ancien.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from app import create_app
+from app.DonneeDAO import DonneeDAO
+from app.services.DonneeService import DonneeService
+from app.services.Cache import cache
+from synthetic_data import generate
+
+# Écart relatif au-delà duquel --comparer signale une régression
+SEUIL_REGRESSION = 1.20
+
+
+def resume(durees):
+    """Statistiques (ms) d'une série de durées en secondes"""
+    ms = sorted(d * 1000 for d in durees)
+    if not ms:
+        return {}
+    return {
+        "n": len(ms),
+        "moyenne_ms": round(sum(ms) / len(ms), 3),
+        "p50_ms": round(ms[len(ms) // 2], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def chronometre(fn, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fn()
+        durees.append(time.perf_counter() - debut)
+    return durees
+
+
+def bench_import(app):
+    with app.app_context():
+        DonneeDAO().init_db()
+        debut = time.perf_counter()
+        stats = DonneeService().run_import_pipeline()
+        complet = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        DonneeService().run_import_pipeline()
+        resync = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        DonneeService().rebuild_database()
+        reconstruction = time.perf_counter() - debut
+
+    return {
+        "duree_s": round(complet, 3),
+        "resync_sans_changement_s": round(resync, 3),
+        "reconstruction_s": round(reconstruction, 3),
+        "etudiants": stats['total_distincts'],
+        "inscriptions": stats['inscriptions'],
+        "evaluations": stats['evaluations'],
+        "fichiers": stats['fichiers'],
+        "inscriptions_par_s": round(stats['inscriptions'] / complet) if complet else 0,
+        "rss_pic_mo": stats['rss_pic_mo'],
+        "workers": stats['workers'],
+        "taille_base_mo": round(os.path.getsize(app.config['DATABASE']) / 1e6, 2),
+    }
+
+
+def bench_recherche(app, repetitions):
+    combinaisons = []
+    toutes, pages = [], []
+    with app.app_context():
+        dao = DonneeDAO()
+        annees = [int(a) for a in dao.get_all_annees()]
+        depts = ["TOUS"] + dao.get_all_departements()
+        taille_page = app.config['PAGE_SIZE']
+
+        for annee in annees:
+            for dept in depts:
+                for rythme in ("TOUS", "FI", "FA"):
+                    lignes = len(dao.search_etudiants(annee, dept, rythme))
+                    d_complet = chronometre(lambda: dao.search_etudiants(annee, dept, rythme), repetitions)
+                    d_page = chronometre(lambda: dao.search_etudiants(annee, dept, rythme, limit=taille_page), repetitions)
+                    toutes += d_complet
+                    pages += d_page
+                    combinaisons.append({
+                        "annee": annee, "dept": dept, "rythme": rythme, "lignes": lignes,
+                        "complet_ms": round(min(d_complet) * 1000, 3),
+                        "page_ms": round(min(d_page) * 1000, 3),
+                    })
+
+    return {"complet": resume(toutes), "page": resume(pages), "combinaisons": combinaisons}
+
+
+def bench_pages(app, repetitions):
+    client = app.test_client()
+    with app.app_context():
+        annees = DonneeDAO().get_all_annees()
+
+    requetes = [("GET /", lambda: client.get('/'))]
+    for annee in annees:
+        formulaire = {'annee': annee, 'departement': 'TOUS', 'rythme': 'TOUS'}
+        requetes.append((f"POST / annee={annee}", lambda f=formulaire: client.post('/', data=f)))
+    if annees:
+        requetes.append(("GET /stats", lambda: client.get('/stats', query_string={'annee': annees[0]})))
+
+    pages = {}
+    for nom, requete in requetes:
+        def rendu(requete=requete):
+            cache.clear()
+            reponse = requete()
+            assert reponse.status_code == 200, f"{nom} : HTTP {reponse.status_code}"
+        pages[nom] = resume(chronometre(rendu, repetitions))
+    return pages
+
+
+def bench_echelle(echelle, repetitions, tmp):
+    static = os.path.join(tmp, f"x{echelle}", 'static')
+    debut = time.perf_counter()
+    corpus = generate(os.path.join(static, 'data', 'json'), echelle)
+    corpus["generation_s"] = round(time.perf_counter() - debut, 2)
+    print(f"[x{echelle}] corpus : {corpus['enregistrements']} enregistrements, "
+          f"{corpus['octets'] / 1e6:.1f} Mo ({corpus['generation_s']} s)")
+
+    app = create_app()
+    app.static_folder = static
+    app.config['DATABASE'] = os.path.join(tmp, f"x{echelle}", 'bench.db')
+
+    resultat = {"echelle": echelle, "corpus": corpus}
+    resultat["import"] = bench_import(app)
+    print(f"[x{echelle}] import : {resultat['import']['duree_s']} s, "
+          f"{resultat['import']['inscriptions']} inscriptions, resync {resultat['import']['resync_sans_changement_s']} s")
+
+    resultat["recherche"] = bench_recherche(app, repetitions)
+    print(f"[x{echelle}] recherche : complet p95 {resultat['recherche']['complet']['p95_ms']} ms, "
+          f"page p95 {resultat['recherche']['page']['p95_ms']} ms")
+
+    resultat["pages"] = bench_pages(app, repetitions)
+    for nom, r in resultat["pages"].items():
+        print(f"[x{echelle}] {nom:22} p50 {r['p50_ms']} ms")
+
+    cache.clear()
+    return resultat
+
+
+def commit_courant():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def indicateurs(resultat):
+    """Métriques comparées d'un commit à l'autre, pour une échelle"""
+    valeurs = {
+        "import.duree_s": resultat["import"]["duree_s"],
+        "import.resync_sans_changement_s": resultat["import"]["resync_sans_changement_s"],
+        "import.reconstruction_s": resultat["import"].get("reconstruction_s"),
+        "recherche.complet.p95_ms": resultat["recherche"]["complet"].get("p95_ms"),
+        "recherche.page.p95_ms": resultat["recherche"]["page"].get("p95_ms"),
+    }
+    for nom, r in resultat["pages"].items():
+        valeurs[f"pages.{nom}.p50_ms"] = r.get("p50_ms")
+    return valeurs
+
+
+def comparer(ancien, nouveau):
+    """Affiche les écarts ; retourne le nombre de régressions au-delà du seuil"""
+    anciens = {r["echelle"]: r for r in ancien["echelles"]}
+    regressions = 0
+    print(f"Comparaison {ancien.get('commit')} -> {nouveau.get('commit')}")
+    for r in nouveau["echelles"]:
+        if r["echelle"] not in anciens:
+            continue
+        avant = indicateurs(anciens[r["echelle"]])
+        for nom, valeur in indicateurs(r).items():
+            ref = avant.get(nom)
+            if not ref or valeur is None:
+                continue
+            ratio = valeur / ref
+            statut = "RÉGRESSION" if ratio > SEUIL_REGRESSION else "ok"
+            regressions += ratio > SEUIL_REGRESSION
+            print(f"{statut:10} x{r['echelle']:<4} {nom:40} {ref:10.3f} -> {valeur:10.3f} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks import / recherche / pages")
+    parser.add_argument("--echelles", default="1,10,100", help="échelles du corpus, séparées par des virgules")
+    parser.add_argument("--repetitions", type=int, default=3, help="mesures par recherche et par page")
+    parser.add_argument("--sortie", default=None, help="fichier JSON des résultats")
+    parser.add_argument("--comparer", default=None, help="résultats JSON d'un autre commit")
+    args = parser.parse_args()
+
+    commit = commit_courant()
+    rapport = {
+        "commit": commit,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plateforme": platform.platform(),
+        "cpu": os.cpu_count(),
+        "echelles": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for echelle in (int(e) for e in args.echelles.split(',')):
+            rapport["echelles"].append(bench_echelle(echelle, args.repetitions, tmp))
+
+    sortie = args.sortie or os.path.join(BENCH_DIR, 'resultats', f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {sortie}")
+
+    if args.comparer:
+        with open(args.comparer, 'r', encoding='utf-8') as f:
+            if comparer(json.load(f), rapport):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Équivalence synchronisation incrémentale / import complet.
+
+Copie les JSON du dépôt dans un dossier temporaire, les importe, puis applique
+une suite de modifications (fichier supprimé, fichier prioritaire modifié puis
+supprimé, fichier rétabli, fichier seulement touché). Après chaque étape, la base synchronisée en
+incrémental est comparée à une base créée de zéro (init + synchro) sur les
+mêmes fichiers : inscriptions, moyennes de compétences, rejets, agrégats de
+cohorte et trajectoires. Échoue (code retour 1) à la première différence.
+
+Usage : python bench/check_incremental.py [--workers 1]
+"""
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.DonneeDAO import DonneeDAO
+from app.services.DonneeService import DonneeService
+from app.services.Cache import cache
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'app', 'static', 'data', 'json')
+
+# Contenu comparé : identifiants internes remplacés par des clés stables (INE, chemin)
+REQUETES = {
+    "inscriptions": """
+        SELECT e.ine, i.annee_universitaire, i.id_etat, i.id_formation, i.id_decision, f.chemin
+        FROM inscription i JOIN etudiant e USING(id_etudiant)
+        LEFT JOIN fichier_source f USING(id_fichier)""",
+    "evaluations": """
+        SELECT e.ine, i.annee_universitaire, v.id_competence, v.id_decision, v.moyenne
+        FROM evaluer v JOIN inscription i USING(id_inscription) JOIN etudiant e USING(id_etudiant)""",
+    "rejets": """
+        SELECT f.chemin, r.motif, r.etudid, r.annee_universitaire, r.id_etat, r.id_formation, r.id_decision,
+               fr.chemin
+        FROM rejet r LEFT JOIN fichier_source f ON f.id_fichier = r.id_fichier
+        LEFT JOIN inscription i ON i.id_inscription = r.id_inscription
+        LEFT JOIN fichier_source fr ON fr.id_fichier = i.id_fichier""",
+    "stat_cohorte": "SELECT * FROM stat_cohorte",
+    "trajectoires": """
+        SELECT e.ine, t.annee_debut, t.dept, t.rythme, t.nb_etapes, t.chemin
+        FROM trajectoire t JOIN etudiant e USING(id_etudiant)""",
+    "manifeste": "SELECT chemin, nb_inscriptions FROM fichier_source",
+}
+
+
+def contenu(app):
+    with app.app_context():
+        db = DonneeDAO().get_db()
+        return {nom: sorted(tuple(r) for r in db.execute(sql)) for nom, sql in REQUETES.items()}
+
+
+def nouvelle_app(static, base, workers):
+    app = create_app()
+    app.static_folder = static
+    app.config['DATABASE'] = base
+    app.config['IMPORT_WORKERS'] = workers
+    return app
+
+
+def synchroniser(app, init=False):
+    cache.clear()
+    with app.app_context():
+        if init:
+            DonneeDAO().init_db()
+        return DonneeService().run_import_pipeline()
+
+
+def etapes(json_dir):
+    """(description, modification du dossier) appliquées l'une après l'autre"""
+    fichiers = sorted(glob.glob(os.path.join(json_dir, "decisions_*.json")))
+    supprime = next((f for f in fichiers if '_fs_236_' in f), fichiers[0])
+    sauvegarde = supprime + '.bak'
+    # Fichier prioritaire modifié : décisions changées et la moitié des étudiants retirés
+    modifie = next((f for f in reversed(fichiers) if os.path.getsize(f) > 10000), fichiers[-1])
+
+    def supprimer():
+        shutil.move(supprime, sauvegarde)
+
+    def modifier():
+        with open(modifie, 'r', encoding='utf-8') as f:
+            etudiants = json.load(f)
+        etudiants = etudiants[::2]
+        for etu in etudiants[::3]:
+            if isinstance(etu.get('annee'), dict):
+                etu['annee'] = dict(etu['annee'], code='AJ')
+        with open(modifie, 'w', encoding='utf-8') as f:
+            json.dump(etudiants, f, ensure_ascii=False)
+
+    def supprimer_modifie():
+        os.remove(modifie)
+
+    def retablir():
+        shutil.move(sauvegarde, supprime)
+
+    def toucher():
+        os.utime(fichiers[1])
+
+    return [
+        (f"suppression de {os.path.basename(supprime)}", supprimer),
+        (f"modification de {os.path.basename(modifie)}", modifier),
+        (f"suppression de {os.path.basename(modifie)}", supprimer_modifie),
+        (f"rétablissement de {os.path.basename(supprime)}", retablir),
+        ("fichier touché sans changement", toucher),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synchronisation incrémentale = import complet")
+    parser.add_argument("--workers", type=int, default=1, help="processus de décodage")
+    args = parser.parse_args()
+
+    echecs = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        static = os.path.join(tmp, 'static')
+        json_dir = os.path.join(static, 'data', 'json')
+        shutil.copytree(SOURCE_DIR, json_dir)
+
+        incrementale = nouvelle_app(static, os.path.join(tmp, 'incrementale.db'), args.workers)
+        synchroniser(incrementale, init=True)
+
+        for n, (description, modifier) in enumerate(etapes(json_dir), 1):
+            modifier()
+            stats = synchroniser(incrementale)
+            complete = nouvelle_app(static, os.path.join(tmp, f'complete_{n}.db'), args.workers)
+            synchroniser(complete, init=True)
+
+            attendu, obtenu = contenu(complete), contenu(incrementale)
+            ecarts = {nom: (len(attendu[nom]), len(obtenu[nom]), len(set(attendu[nom]) ^ set(obtenu[nom])))
+                      for nom in REQUETES if attendu[nom] != obtenu[nom]}
+            statut = "ÉCHEC" if ecarts else "ok"
+            print(f"{statut:5} {description} : {len(obtenu['inscriptions'])} inscriptions, "
+                  f"{stats['fichiers_relus']} fichier(s) relu(s) en partie")
+            for nom, (nb_attendu, nb_obtenu, nb_diff) in ecarts.items():
+                print(f"        {nom} : {nb_obtenu} lignes au lieu de {nb_attendu} ({nb_diff} différences)")
+            echecs += bool(ecarts)
+
+    if echecs:
+        print(f"{echecs} étape(s) où l'incrémental diffère de l'import complet.")
+        return 1
+    print("Synchronisation incrémentale identique à l'import complet.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
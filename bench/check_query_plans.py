@@ -0,0 +1,112 @@
+"""
+Régression des plans de requête de la recherche de cohorte.
+
+Construit une base temporaire à partir des JSON du dépôt, puis lance
+EXPLAIN QUERY PLAN sur toutes les combinaisons de filtres
+(département / rythme / TOUS) : recherche complète, pages servies par
+l'application (première page, suivante, précédente avec LIMIT) et
+comptage du total ; ainsi que sur la recherche d'étudiant par début
+d'INE. Échoue (code retour 1) si un parcours complet de la table
+inscription (ou etudiant pour les pages, etudiant / evaluer pour la
+fiche) réapparaît.
+
+Usage : python bench/check_query_plans.py
+"""
+import os
+import re
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.DonneeDAO import DonneeDAO
+from app.services.DonneeService import DonneeService
+
+# "SCAN i", "SCAN inscription", "SCAN i USING COVERING INDEX ..." : parcours complet ;
+# "SEARCH i USING AUTOMATIC ... INDEX" aussi : l'index temporaire est construit par un parcours complet
+FULL_SCAN = re.compile(r'^(SCAN (TABLE )?(inscription|i)\b|SEARCH (inscription|i) USING AUTOMATIC)')
+# Pages : ORDER BY e.ine + LIMIT peut tenter SQLite de parcourir etudiant dans l'ordre de l'INE,
+# en entier (SCAN) ou à partir du curseur (SEARCH sur une plage d'INE)
+FULL_SCAN_PAGE = re.compile(r'^(SCAN (TABLE )?(inscription|etudiant|i|e)\b|SEARCH (inscription|i) USING AUTOMATIC'
+                            r'|SEARCH (etudiant|e) .*\(ine[<>])')
+FULL_SCAN_FICHE = re.compile(r'^SCAN (TABLE )?(etudiant|inscription|evaluer|i|ev)\b')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app()
+        app.config['DATABASE'] = os.path.join(tmp, 'plans.db')
+        app.config['IMPORT_WORKERS'] = 1
+
+        with app.app_context():
+            dao = DonneeDAO()
+            dao.init_db()
+            DonneeService().run_import_pipeline()
+
+            annees = [int(a) for a in dao.get_all_annees()]
+            depts = ["TOUS"] + dao.get_all_departements()
+            taille = app.config['PAGE_SIZE'] + 1
+            echecs = 0
+
+            for dept in depts:
+                for rythme in ("TOUS", "FI", "FA"):
+                    # Curseur au milieu de la cohorte, comme après quelques pages
+                    lignes = dao.search_etudiants(annees[0], dept, rythme)
+                    cle = (lignes[len(lignes) // 2]["ine"], lignes[len(lignes) // 2]["annee_universitaire"]) if lignes else ("", 0)
+                    requetes = [
+                        ("complete", dao.explain_search(annees[0], dept, rythme), FULL_SCAN),
+                        ("page", dao.explain_search(annees[0], dept, rythme, taille), FULL_SCAN_PAGE),
+                        ("apres", dao.explain_search(annees[0], dept, rythme, taille, apres=cle), FULL_SCAN_PAGE),
+                        ("avant", dao.explain_search(annees[0], dept, rythme, taille, avant=cle), FULL_SCAN_PAGE),
+                        ("comptage", dao.explain_count(annees[0], dept, rythme), FULL_SCAN),
+                    ]
+
+                    debut = time.perf_counter()
+                    for annee in annees:
+                        dao.search_etudiants(annee, dept, rythme)
+                    ms = (time.perf_counter() - debut) * 1000 / len(annees)
+                    debut = time.perf_counter()
+                    for annee in annees:
+                        dao.search_etudiants(annee, dept, rythme, taille, apres=cle)
+                        dao.count_etudiants(annee, dept, rythme)
+                    ms_page = (time.perf_counter() - debut) * 1000 / len(annees)
+
+                    en_echec = [(nom, plan) for nom, plan, motif in requetes
+                                if any(motif.match(ligne) for ligne in plan)]
+                    statut = "ÉCHEC" if en_echec else "ok"
+                    print(f"{statut:5} dept={dept:10} rythme={rythme:4} {ms:6.2f} ms/recherche"
+                          f"  {ms_page:6.2f} ms/page + comptage")
+                    for nom, plan in en_echec:
+                        echecs += 1
+                        print(f"      {nom} :")
+                        for ligne in plan:
+                            print(f"        {ligne}")
+
+            # Fiche étudiant : identifiant complet, puis préfixes de plus en plus courts
+            ine = dao.search_etudiants(annees[0], "TOUS", "TOUS", limit=1)[0]["ine"]
+            for prefixe in (ine, ine[:6], ine[:1]):
+                plan = dao.explain_lookup(prefixe, 21)
+                scans = [ligne for ligne in plan if FULL_SCAN_FICHE.match(ligne)]
+
+                debut = time.perf_counter()
+                nb = len(dao.find_etudiants(prefixe, 21))
+                ms = (time.perf_counter() - debut) * 1000
+
+                statut = "ÉCHEC" if scans else "ok"
+                print(f"{statut:5} fiche q={prefixe[:12]:12} {ms:6.2f} ms ({nb} lignes)")
+                if scans:
+                    echecs += 1
+                    for ligne in plan:
+                        print(f"        {ligne}")
+
+    if echecs:
+        print(f"{echecs} requête(s) parcourent toute une table.")
+        return 1
+    print("Aucun parcours complet de table.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
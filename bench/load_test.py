@@ -0,0 +1,155 @@
+"""
+Test de charge HTTP d'un serveur lancé à part (développement ou gunicorn).
+
+Plusieurs clients simultanés enchaînent des requêtes pendant une durée fixe ;
+pour chaque scénario on affiche le débit (req/s), les latences p50 / p95 / max
+et le nombre d'erreurs. Scénarios : page d'accueil seule, page d'accueil
+avec une recherche (année, département et rythme tournants : une fois chaque
+combinaison vue, servie par le cache LRU), la même recherche sans cache
+(curseur de pagination unique à chaque requête, donc exécutée en SQL) et
+API JSON.
+
+Usage : python bench/load_test.py [--url http://localhost:8000] [--clients 16]
+                                  [--duree 10] [--sortie resultats.json]
+"""
+import sys
+import json
+import base64
+import random
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit, urlencode
+
+
+def scenarios(criteres):
+    """
+    (nom, fonction i -> chemin). criteres : combinaisons (annee, departement, rythme).
+    Le nombre de combinaisons reste sous la taille du cache LRU : « recherche » mesure
+    surtout le cache, « recherche sans cache » la requête SQL paginée et le comptage.
+    """
+    annees = sorted({c[0] for c in criteres})
+
+    def recherche(i):
+        annee, dept, rythme = criteres[i % len(criteres)]
+        return "/?" + urlencode({"annee": annee, "departement": dept, "rythme": rythme})
+
+    def recherche_sans_cache(i):
+        # Curseur « après un INE aléatoire » : clé de cache jamais vue. Année entière et
+        # curseur dans la première moitié des INE (hexadécimaux) : pages pleines le plus souvent
+        cle = json.dumps([f"{random.getrandbits(47):012x}", 0])
+        apres = base64.urlsafe_b64encode(cle.encode('utf-8')).decode('ascii')
+        return "/?" + urlencode({"annee": annees[i % len(annees)], "departement": "TOUS",
+                                 "rythme": "TOUS", "apres": apres})
+
+    def api(i):
+        return "/api/etudiants?" + urlencode({"annee": annees[i % len(annees)]})
+
+    return [
+        ("GET /", lambda i: "/"),
+        ("GET / + recherche", recherche),
+        ("GET / + recherche sans cache", recherche_sans_cache),
+        ("GET /api/etudiants", api),
+    ]
+
+
+def client(hote, port, chemin_de, fin, latences, erreurs, verrou):
+    conn = http.client.HTTPConnection(hote, port, timeout=30)
+    i = 0
+    mesures, nb_erreurs = [], 0
+    while time.perf_counter() < fin:
+        debut = time.perf_counter()
+        try:
+            conn.request("GET", chemin_de(i))
+            reponse = conn.getresponse()
+            reponse.read()
+            if reponse.status >= 400:
+                nb_erreurs += 1
+            else:
+                mesures.append(time.perf_counter() - debut)
+        except (OSError, http.client.HTTPException):
+            # Connexion refusée ou coupée : comptée en erreur, hors latences
+            nb_erreurs += 1
+            conn.close()
+            conn = http.client.HTTPConnection(hote, port, timeout=30)
+            time.sleep(0.01)
+        i += 1
+    conn.close()
+    with verrou:
+        latences.extend(mesures)
+        erreurs.append(nb_erreurs)
+
+
+def lancer(url, chemin_de, clients, duree):
+    parts = urlsplit(url)
+    latences, erreurs, verrou = [], [], threading.Lock()
+    debut = time.perf_counter()
+    fin = debut + duree
+    threads = [threading.Thread(target=client, args=(parts.hostname, parts.port or 80, chemin_de, fin, latences, erreurs, verrou))
+               for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ecoule = time.perf_counter() - debut
+
+    ms = sorted(d * 1000 for d in latences)
+    if not ms:
+        return {"requetes": 0, "erreurs": sum(erreurs)}
+    return {
+        "requetes": len(ms),
+        "erreurs": sum(erreurs),
+        "req_par_s": round(len(ms) / ecoule, 1),
+        "p50_ms": round(ms[len(ms) // 2], 2),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 2),
+        "max_ms": round(ms[-1], 2),
+    }
+
+
+def criteres_disponibles(url):
+    """
+    Combinaisons (annee, departement, rythme) présentes dans les statistiques, avec
+    « TOUS » pour le département et le rythme (repli sur quatre années si indisponible)
+    """
+    parts = urlsplit(url)
+    try:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        conn.request("GET", "/stats/json")
+        lignes = json.loads(conn.getresponse().read())
+        criteres = set()
+        for l in lignes:
+            annee = str(l["annee_debut"])
+            criteres.update({(annee, l["dept"], l["rythme"]), (annee, l["dept"], "TOUS"),
+                             (annee, "TOUS", l["rythme"]), (annee, "TOUS", "TOUS")})
+        if criteres:
+            return sorted(criteres)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return [(annee, "TOUS", "TOUS") for annee in ("2021", "2022", "2023", "2024")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge HTTP")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=16, help="clients simultanés")
+    parser.add_argument("--duree", type=float, default=10, help="durée de chaque scénario (s)")
+    parser.add_argument("--sortie", default=None, help="fichier JSON des résultats")
+    args = parser.parse_args()
+
+    criteres = criteres_disponibles(args.url)
+    rapport = {"url": args.url, "clients": args.clients, "duree_s": args.duree, "scenarios": {}}
+    for nom, chemin_de in scenarios(criteres):
+        r = lancer(args.url, chemin_de, args.clients, args.duree)
+        rapport["scenarios"][nom] = r
+        print(f"{nom:30} {r.get('req_par_s', 0):8} req/s  p50 {r.get('p50_ms', '-')} ms  "
+              f"p95 {r.get('p95_ms', '-')} ms  max {r.get('max_ms', '-')} ms  erreurs {r['erreurs']}")
+
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, ensure_ascii=False, indent=2)
+    return 1 if any(r["erreurs"] for r in rapport["scenarios"].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Générateur de corpus ScoDoc synthétiques pour les benchmarks.
+
+Le corpus du dépôt (static/data/json) sert de gabarit : à l'échelle N,
+chaque fichier decisions_jury_* est répliqué N fois sous un nouveau
+formsemestre (fs_<id>), avec des étudiants distincts (etudid / code_nip
+re-hachés) et des moyennes de RCUE légèrement bruitées. Les formes des
+enregistrements (rcues, annee.ordre, etat, autorisations...) sont celles
+des exports réels, donc l'import suit les mêmes chemins de code.
+formsemestres_*.json est étendu avec les semestres répliqués ;
+departements.json, formations.json et les référentiels sont copiés.
+
+Usage : python bench/synthetic_data.py <dossier_destination> [échelle] [graine]
+"""
+import os
+import re
+import sys
+import glob
+import json
+import random
+import shutil
+import hashlib
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'app', 'static', 'data', 'json')
+
+# Décalage des identifiants de formsemestre d'une réplique à l'autre
+DECALAGE_FS = 100000
+
+
+def _rehash(valeur, replique):
+    if not valeur or replique == 0:
+        return valeur
+    return hashlib.sha256(f"{replique}:{valeur}".encode()).hexdigest()
+
+
+def _fs_id(fs_id, replique):
+    return fs_id + replique * DECALAGE_FS if replique else fs_id
+
+
+def _bruiter(moy, rng):
+    if not isinstance(moy, (int, float)):
+        return moy
+    return round(min(20.0, max(0.0, moy + rng.uniform(-1.0, 1.0))), 6)
+
+
+def _replique_etudiant(etu, replique, rng):
+    etu = dict(etu)
+    etu['etudid'] = _rehash(etu.get('etudid'), replique)
+    etu['code_nip'] = _rehash(etu.get('code_nip'), replique)
+    etu['code_ine'] = _rehash(etu.get('code_ine'), replique)
+
+    if replique and isinstance(etu.get('rcues'), list):
+        rcues = []
+        for rcue in etu['rcues']:
+            rcue = dict(rcue)
+            rcue['moy'] = _bruiter(rcue.get('moy'), rng)
+            rcues.append(rcue)
+        etu['rcues'] = rcues
+
+    if isinstance(etu.get('autorisations'), list):
+        etu['autorisations'] = [
+            dict(a, etudid=etu['etudid'],
+                 origin_formsemestre_id=_fs_id(a.get('origin_formsemestre_id') or 0, replique))
+            for a in etu['autorisations']
+        ]
+    return etu
+
+
+def generate(dest, echelle=1, graine=0, source=SOURCE_DIR):
+    """
+    Écrit un corpus à l'échelle donnée dans dest (créé si besoin).
+    Retourne un résumé : nombre de fichiers, d'enregistrements et taille en octets.
+    """
+    os.makedirs(dest, exist_ok=True)
+    rng = random.Random(graine)
+    nb_fichiers = 0
+    nb_enregistrements = 0
+
+    # Fichiers copiés tels quels
+    copies = ['departements.json', 'formations.json'] + \
+        [os.path.basename(p) for p in glob.glob(os.path.join(source, "referentiel_competences_BUT_*.json"))]
+    for nom in copies:
+        if os.path.exists(os.path.join(source, nom)):
+            shutil.copyfile(os.path.join(source, nom), os.path.join(dest, nom))
+            nb_fichiers += 1
+
+    # Formsemestres : un semestre répliqué par réplique, même formation et mêmes parcours
+    for f_path in glob.glob(os.path.join(source, "formsemestres_*.json")):
+        with open(f_path, 'r', encoding='utf-8') as f:
+            semestres = json.load(f)
+        repliques = [dict(sem, id=_fs_id(sem['id'], r)) for r in range(echelle) for sem in semestres]
+        with open(os.path.join(dest, os.path.basename(f_path)), 'w', encoding='utf-8') as f:
+            json.dump(repliques, f, ensure_ascii=False)
+        nb_fichiers += 1
+
+    # Décisions de jury : une copie par réplique sous un nouveau fs_<id>
+    for f_path in sorted(glob.glob(os.path.join(source, "decisions_*.json"))):
+        nom = os.path.basename(f_path)
+        m = re.search(r'_fs_(\d+)', nom)
+        with open(f_path, 'r', encoding='utf-8') as f:
+            etudiants = json.load(f)
+
+        for r in range(echelle):
+            nom_replique = nom
+            if m:
+                nom_replique = nom.replace(m.group(0), f"_fs_{_fs_id(int(m.group(1)), r)}", 1)
+            elif r:
+                nom_replique = nom.replace('.json', f"_r{r}.json")
+
+            donnees = [_replique_etudiant(e, r, rng) for e in etudiants] if isinstance(etudiants, list) else etudiants
+            with open(os.path.join(dest, nom_replique), 'w', encoding='utf-8') as f:
+                json.dump(donnees, f, ensure_ascii=False)
+            nb_fichiers += 1
+            nb_enregistrements += len(donnees) if isinstance(donnees, list) else 0
+
+    taille = sum(os.path.getsize(p) for p in glob.glob(os.path.join(dest, '*.json')))
+    return {"echelle": echelle, "fichiers": nb_fichiers,
+            "enregistrements": nb_enregistrements, "octets": taille}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return 1
+    echelle = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    graine = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    resume = generate(sys.argv[1], echelle, graine)
+    print(f"{resume['fichiers']} fichiers, {resume['enregistrements']} enregistrements, "
+          f"{resume['octets'] / 1e6:.1f} Mo dans {sys.argv[1]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Configuration gunicorn : plusieurs processus, plusieurs threads chacun.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Variables d'environnement : BIND, WEB_WORKERS, WEB_THREADS.
+"""
+import os
+import multiprocessing
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# Processus : les recherches sont liées au CPU (GIL), un worker par cœur environ
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() + 1))
+# Threads par worker : les lectures SQLite libèrent le GIL, une connexion par thread (pool)
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+# Application créée avant le fork ; cache rempli dans chaque worker
+# (les connexions SQLite sont ouvertes par chaque thread à sa première requête)
+preload_app = True
+timeout = 60
+keepalive = 5
+
+accesslog = os.environ.get('ACCESS_LOG')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.warm_up()
+    server.log.info(f"Worker {worker.pid} préchauffé")
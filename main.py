@@ -3,4 +3,6 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host="localhost", port=8000, debug=True)
\ No newline at end of file
+    # Serveur de développement ; en production, voir wsgi.py et gunicorn.conf.py
+    app.run(host="localhost", port=8000, debug=app.config['DEBUG'],
+            use_reloader=app.config['DEBUG'], threaded=True)
@@ -0,0 +1,34 @@
+"""
+Point d'entrée WSGI de production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+L'application est créée une seule fois dans le processus maître
+(preload_app), avant le fork des workers ; aucune connexion SQLite n'est
+ouverte à ce stade. Chaque worker remplit ensuite son cache (warm_up) ;
+les connexions, elles, sont ouvertes par chaque thread de requêtes à sa
+première requête (une connexion par thread, voir ConnectionPool).
+"""
+import os
+import sqlite3
+
+os.environ.setdefault('SCOLARITE_ENV', 'production')
+
+from app import create_app
+from app.ConnectionPool import pool
+from app.services.DonneeService import DonneeService
+
+app = create_app()
+
+
+def warm_up():
+    """Cache du worker courant (menus, état de la base), avant sa première requête"""
+    with app.app_context():
+        try:
+            DonneeService().warm_up()
+        except sqlite3.Error as e:
+            # Base absente ou en cours d'initialisation : le worker démarre quand même
+            print(f"Préchauffage impossible : {e}")
+    # Le thread qui préchauffe ne sert aucune requête (gthread les confie à ses
+    # propres threads) : sa connexion resterait ouverte pour rien
+    pool.close_thread()